@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark of the compute and location hot paths.
+
+Each benchmark is run on synthetic gardens of 4 to 7 LEDs (regular polygons)
+with the robot at random positions inside. The frames are generated by the
+simulator (see pleepleeloc/simulation.py). The latency percentiles and the
+memory allocated per call are saved as JSON to compare releases:
+
+    $ python3 benchmarks/run.py --output bench.json
+"""
+
+import argparse
+import copy
+import json
+import platform
+import random
+import time
+import tracemalloc
+
+import numpy as np
+
+from pleepleeloc import compute
+from pleepleeloc.garden import Garden
+from pleepleeloc.geometry import Point
+from pleepleeloc.location import ALL_PAIRS, Location, Odometry
+from pleepleeloc.simulation import Simulator, regularGarden
+
+DIR_INIT = (1.0, 0.0)
+ANGLE_NORTH = 0.0
+HEIGHT = 0.0
+
+
+def syntheticPositions(garden, count, rng):
+    """Random positions and headings strictly inside the garden."""
+    positions = []
+    (minx, miny, maxx, maxy) = garden.bounds
+    while len(positions) < count:
+        x = rng.uniform(minx, maxx)
+        y = rng.uniform(miny, maxy)
+        if garden.contains([x], [y])[0]:
+            positions.append((x, y, rng.uniform(-180.0, 180.0)))
+    return positions
+
+
+def freshFrame(frame):
+    """Copy of a frame with new Data instances.
+
+    Data.adjustDistance modifies the datas, so each call gets its own copy
+    (made outside of the timed region) and times the path of the field.
+    """
+    return dict(frame, datas=[copy.copy(data) for data in frame['datas']])
+
+
+def measure(call, calls, frames):
+    """Latencies (ns) and allocations (bytes) of call(frame)."""
+    latencies = []
+    for i in range(calls):
+        frame = freshFrame(frames[i % len(frames)])
+        start = time.perf_counter_ns()
+        call(frame)
+        latencies.append(time.perf_counter_ns() - start)
+
+    allocations = []
+    tracemalloc.start()
+    for frame in frames[:min(len(frames), 50)]:
+        frame = freshFrame(frame)
+        (before, _) = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        call(frame)
+        (_, peak) = tracemalloc.get_traced_memory()
+        allocations.append(peak - before)
+    tracemalloc.stop()
+
+    latencies = np.array(latencies, dtype=np.float64) / 1000.0
+    return {
+        'calls': calls,
+        'mean_us': float(latencies.mean()),
+        'p50_us': float(np.percentile(latencies, 50)),
+        'p90_us': float(np.percentile(latencies, 90)),
+        'p99_us': float(np.percentile(latencies, 99)),
+        'max_us': float(latencies.max()),
+        'peak_alloc_bytes': int(np.median(allocations)),
+    }
+
+
+def benchmarks(size):
+    """The benchmarks of a garden, as a dictionary name -> call(frame)."""
+    garden = Garden(regularGarden(size))
+    loc = Location(ANGLE_NORTH, DIR_INIT, HEIGHT, *garden)
+    allPairs = Location(ANGLE_NORTH, DIR_INIT, HEIGHT, *garden,
+                        solver=ALL_PAIRS)
+
+    def args(frame):
+        return [DIR_INIT, ANGLE_NORTH, frame['angleToDirection'], garden]
+
+    def getPos2Dist(frame):
+        (data1, data2) = frame['datas'][:2]
+        data1.distance = frame['distances'][0]
+        data2.distance = frame['distances'][1]
+        compute.getPos2Dist(data1, data2)
+
+    def distanceFromAngles(frame):
+        compute.distanceFromAngles(*frame['datas'][:2], *args(frame))
+
+    def filterPoints(frame):
+        compute.filterPoints(frame['candidates'], garden)
+
+    def compute2Data(frame):
+        compute.compute2Data(*frame['datas'][:2], *args(frame))
+
+    def compute3Data(frame):
+        compute.compute3Data(*frame['datas'][:3], *args(frame))
+
+    def computeAllPairs(frame):
+        compute.computeAllPairs(frame['datas'], *args(frame))
+
+    def sortData(frame):
+        compute.sortData(frame['candidates'])
+
+    def computePos(frame):
+        loc.computePos(frame['angleToDirection'], frame['odometry'],
+                       *frame['datas'])
+
+    def computePosAllPairs(frame):
+        allPairs.computePos(frame['angleToDirection'], frame['odometry'],
+                            *frame['datas'])
+
+    return garden, {
+        'getPos2Dist': getPos2Dist,
+        'distanceFromAngles': distanceFromAngles,
+        'filterPoints': filterPoints,
+        'compute2Data': compute2Data,
+        'compute3Data': compute3Data,
+        'computeAllPairs': computeAllPairs,
+        'sortData': sortData,
+        'Location.computePos': computePos,
+        'Location.computePos[allpairs]': computePosAllPairs,
+    }
+
+
+def makeFrames(garden, count, rng):
+    """Synthetic frames generated by the simulator."""
+    (xs, ys, headings) = zip(*syntheticPositions(garden, count, rng))
+    simulator = Simulator(garden, DIR_INIT, ANGLE_NORTH, bearingNoise=0.5,
+                          headingNoise=1.0, seed=rng.randrange(2**32))
+    run = simulator.run(xs, ys, headings)
+    frames = []
+    for (i, (angleToDirection, odometry, datas)) in enumerate(run):
+        (x, y) = run.positions[i].tolist()
+        distances = [datas[j].led.point.distance(Point(x, y))
+                     for j in range(2)]
+        candidates = [Point(x + rng.gauss(0.0, 0.03),
+                            y + rng.gauss(0.0, 0.03)) for _ in range(8)]
+        candidates += [Point(rng.uniform(0.0, 12.0), rng.uniform(0.0, 12.0))
+                       for _ in range(2)]
+        frames.append({
+            'angleToDirection': angleToDirection,
+            'datas': datas,
+            'distances': distances,
+            # Random frames: the last position is close to the actual one
+            'odometry': Odometry(Point(x + 0.05, y - 0.05), 0.1),
+            'candidates': candidates,
+        })
+    return frames
+
+
+def run(sizes, calls, seed):
+    """Run all the benchmarks on gardens of the given sizes."""
+    results = []
+    for size in sizes:
+        rng = random.Random(seed + size)
+        (garden, cases) = benchmarks(size)
+        frames = makeFrames(garden, 200, rng)
+        for (name, call) in cases.items():
+            stats = measure(call, calls, frames)
+            stats.update({'benchmark': name, 'leds': size})
+            results.append(stats)
+            print('%-32s %d LEDs  p50 %9.1f us  p99 %9.1f us  %8d B' %
+                  (name, size, stats['p50_us'], stats['p99_us'],
+                   stats['peak_alloc_bytes']))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Benchmark of the compute and location hot paths.')
+    parser.add_argument('--output', default='bench.json',
+                        help='JSON file where the results are saved')
+    parser.add_argument('--calls', type=int, default=2000,
+                        help='number of calls per benchmark')
+    parser.add_argument('--leds', type=int, nargs='+', default=[4, 5, 6, 7],
+                        help='sizes of the synthetic gardens')
+    parser.add_argument('--seed', type=int, default=0)
+    options = parser.parse_args(argv)
+
+    results = run(options.leds, options.calls, options.seed)
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'calls': options.calls,
+        'seed': options.seed,
+        'results': results,
+    }
+    with open(options.output, 'w') as output:
+        json.dump(report, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
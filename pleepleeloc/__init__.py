@@ -1,7 +1,17 @@
 # -*- coding: utf-8 -*-
-from . import geometry
-from . import compute
-from . import utils
-from . import location
+import importlib
 
-__all__ = ['geometry', 'compute', 'utils', 'location']
+# The submodules are imported on first access (PEP 562), so that importing
+# the package only loads what is used.
+__all__ = ['geometry', 'garden', 'compute', 'utils', 'location', 'tracking',
+           'simulation', 'fleet', 'streaming', 'observations', 'replay']
+
+
+def __getattr__(name):
+    if name in __all__:
+        return importlib.import_module('.' + name, __name__)
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -7,11 +7,17 @@
 #           related to the robot location               #
 #########################################################
 
+import logging
 import math
+import time
 
-import shapely.geometry
+import numpy as np
 
-from .geometry import Point, angleBetween2Vects, rotateVector
+from .garden import Garden, LEDPair, compileGarden
+from .observations import ObservationBatch
+from .geometry import (Point, PointArray, angleBetween2Vects, cross, dot,
+                       rotateVector, unitVectors)
+from .utils import Color, adjustedDistance
 
 """
 This file contains the computation of all datas recieved by the robot to
@@ -79,6 +85,200 @@ The direction D is the direction of the robot at initialisation.
 # The mathematical precision for round operations
 PRECISION = 4
 
+logger = logging.getLogger(__name__)
+
+# Stages of the computation reported to the hooks (see Stopwatch)
+DISTANCES = 'distances'
+INTERSECTION = 'intersection'
+PERIMETER = 'perimeter'
+RESECTION = 'resection'
+ODOMETRY = 'odometry'
+CONSENSUS = 'consensus'
+GATING = 'gating'
+
+
+class Stopwatch:
+    """Report the duration of the stages of a computation to a hook.
+
+    The hook is called as hook(stage, duration, count) at the end of each
+    stage, with the duration in seconds and the number of candidates (or
+    pairs) produced by the stage.
+    """
+
+    def __init__(self, hook):
+        self.hook = hook
+        self.start = time.perf_counter()
+
+    def lap(self, stage, count):
+        """End a stage and start the next one."""
+        now = time.perf_counter()
+        self.hook(stage, now - self.start, count)
+        self.start = now
+
+
+class _NoStopwatch:
+    """Stopwatch used when there is no hook: does nothing."""
+
+    def lap(self, stage, count):
+        pass
+
+
+_NO_STOPWATCH = _NoStopwatch()
+
+
+def stopwatch(hook):
+    """Get a Stopwatch for a hook, or one doing nothing if hook is None."""
+    if hook is None:
+        return _NO_STOPWATCH
+    return Stopwatch(hook)
+
+
+class CircleIntersections:
+    """Result of a batch of circle intersections.
+
+    Each row of the arrays corresponds to one pair of circles given to
+    **intersectCircles**. The masks are mutually exclusive and explain why a
+    pair has no solution, instead of printing it.
+
+    Attributes:
+        first: (N, 2) array. First intersection of each pair.
+
+        second: (N, 2) array. Second intersection of each pair. The two
+                points are ordered as in **getPos2Dist** (the one with the
+                greatest angle from the first center comes first).
+
+        noIntersection: (N,) bool array. The circles are too far apart.
+
+        contained: (N,) bool array. One circle is contained within the other.
+
+        coincident: (N,) bool array. The circles are equal and coincident.
+
+        tangent: (N,) bool array. The circles touch in a single point,
+                 **first** and **second** are then equal.
+    """
+
+    def __init__(self, first, second, noIntersection, contained, coincident,
+                 tangent):
+        self.first = first
+        self.second = second
+        self.noIntersection = noIntersection
+        self.contained = contained
+        self.coincident = coincident
+        self.tangent = tangent
+
+    def __len__(self):
+        return len(self.first)
+
+    @property
+    def valid(self):
+        """Mask of the pairs that have at least one intersection."""
+        return ~(self.noIntersection | self.contained | self.coincident)
+
+    def candidates(self):
+        """Flatten the intersections to a single array of candidates.
+
+        The candidates are ordered pair by pair, the first intersection
+        before the second one. Tangent pairs only yield one candidate.
+
+        Returns:
+            A (M, 2) array of coordinates.
+        """
+        valid = self.valid
+        mask = np.stack((valid, valid & ~self.tangent), axis=1)
+        points = np.stack((self.first, self.second), axis=1)
+        return points[mask]
+
+
+def intersectCircles(centers1, radii1, centers2, radii2):
+    """Intersect N pairs of circles in a single vectorized call.
+
+    This is the batch version of **getPos2Dist**: the i-th circle of
+    (centers1, radii1) is intersected with the i-th circle of
+    (centers2, radii2).
+
+    Args:
+        centers1: (N, 2) array-like of the first circles centers.
+        radii1: (N,) array-like of the first circles radii.
+        centers2: (N, 2) array-like of the second circles centers.
+        radii2: (N,) array-like of the second circles radii.
+
+    Returns:
+        A CircleIntersections instance.
+    """
+    P1 = np.asarray(centers1, dtype=np.float64).reshape(-1, 2)
+    P2 = np.asarray(centers2, dtype=np.float64).reshape(-1, 2)
+    R1 = np.asarray(radii1, dtype=np.float64).reshape(-1)
+    R2 = np.asarray(radii2, dtype=np.float64).reshape(-1)
+
+    delta = P2 - P1
+    D = np.hypot(delta[:, 0], delta[:, 1])
+    noIntersection = D > R1 + R2
+    contained = ~noIntersection & (D < np.abs(R2 - R1))
+    coincident = ~noIntersection & ~contained & (D == 0) & (R1 == R2)
+    valid = ~(noIntersection | contained | coincident)
+
+    # Invalid pairs are computed with a neutral divisor and then ignored.
+    safeD = np.where(valid, D, 1.0)
+    chorddistance = (R1**2 - R2**2 + D**2) / (2 * safeD)
+    # distance from 1st circle's centre to the chord between intersects
+    halfchordlength = np.sqrt(np.clip(R1**2 - chorddistance**2, 0.0, None))
+    midpoint = P1 + delta * (chorddistance / safeD)[:, None]
+    offset = np.stack((delta[:, 1], -delta[:, 0]), axis=1) \
+        * (halfchordlength / safeD)[:, None]
+
+    first = midpoint + offset
+    second = midpoint - offset
+    theta1 = np.arctan2(first[:, 1] - P1[:, 1], first[:, 0] - P1[:, 0])
+    theta2 = np.arctan2(second[:, 1] - P1[:, 1], second[:, 0] - P1[:, 0])
+    swap = (theta2 > theta1)[:, None]
+    first, second = (np.where(swap, second, first),
+                     np.where(swap, first, second))
+
+    tangent = valid & ((D == R1 + R2) | (D == np.abs(R1 - R2)))
+    return CircleIntersections(first, second, noIntersection, contained,
+                               coincident, tangent)
+
+
+def _intersect2Circles(x1, y1, r1, x2, y2, r2):
+    """Intersect a single pair of circles with scalar math.
+
+    Same result as **intersectCircles** for one pair, without the overhead
+    of the arrays: it is used when a frame only has a few pairs.
+
+    Returns:
+        A list of 0, 1 (tangent circles) or 2 tuples (x, y).
+    """
+    dx = x2 - x1
+    dy = y2 - y1
+    D = math.hypot(dx, dy)
+    if D > r1 + r2:
+        logger.debug("No solution - The circles do not intersect")
+        return []
+    elif D < math.fabs(r2 - r1):
+        logger.debug("No solution - One circle is contained within the other")
+        return []
+    elif D == 0 and r1 == r2:
+        logger.debug("No solution - The circles are equal and coincident")
+        return []
+
+    chorddistance = (r1**2 - r2**2 + D**2) / (2 * D)
+    # distance from 1st circle's centre to the chord between intersects
+    halfchordlength = math.sqrt(max(r1**2 - chorddistance**2, 0.0))
+    chordmidpointx = x1 + (chorddistance * dx) / D
+    chordmidpointy = y1 + (chorddistance * dy) / D
+
+    I1 = (chordmidpointx + (halfchordlength * dy) / D,
+          chordmidpointy - (halfchordlength * dx) / D)
+    if D == r1 + r2 or D == math.fabs(r1 - r2):
+        return [I1]
+    I2 = (chordmidpointx - (halfchordlength * dy) / D,
+          chordmidpointy + (halfchordlength * dx) / D)
+    theta1 = math.atan2(I1[1] - y1, I1[0] - x1)
+    theta2 = math.atan2(I2[1] - y1, I2[0] - x1)
+    if theta2 > theta1:
+        I1, I2 = I2, I1
+    return [I1, I2]
+
 
 def getPos2Dist(data1, data2):
     """Get a set of positions from two sets of datas.
@@ -97,73 +297,32 @@ def getPos2Dist(data1, data2):
 
     P1 = data1.led.point
     P2 = data2.led.point
-    R1 = data1.distance
-    R2 = data2.distance
-
-    dx = P2.X - P1.X
-    dy = P2.Y - P1.Y
-    D = P1.distance(P2)
-    if D > R1 + R2:
-        print("No solution - The circles do not intersect")
-        return []
-    elif D < math.fabs(R2 - R1):
-        print("No solution - One circle is contained within the other")
-        return []
-    elif D == 0 and R1 == R2:
-        print("No solution - The circles are equal and coincident")
-        return []
-
-    chorddistance = (R1**2 - R2**2 + D**2) / (2 * D)
-    # distance from 1st circle's centre to the chord between intersects
-    halfchordlength = math.sqrt(R1**2 - chorddistance**2)
-    chordmidpointx = P1.X + (chorddistance * dx) / D
-    chordmidpointy = P1.Y + (chorddistance * dy) / D
-
-    I1 = Point(
-        round(chordmidpointx + (halfchordlength * dy) / D, PRECISION),
-        round(chordmidpointy - (halfchordlength * dx) / D, PRECISION))
-    theta1 = round(
-        math.degrees(math.atan2(I1.Y - P1.Y, I1.X - P1.X)), PRECISION)
-
-    I2 = Point(
-        round(chordmidpointx - (halfchordlength * dy) / D, PRECISION),
-        round(chordmidpointy + (halfchordlength * dx) / D, PRECISION))
-    theta2 = round(
-        math.degrees(math.atan2(I2.Y - P1.Y, I2.X - P1.X)), PRECISION)
-
-    if D == R1 + R2 or D == R1 - R2:
-        return [I1]
-
-    if theta2 > theta1:
-        I1, I2 = I2, I1
-    return [I1, I2]
+    return [Point(round(x, PRECISION), round(y, PRECISION))
+            for (x, y) in _intersect2Circles(P1.X, P1.Y, data1.distance,
+                                             P2.X, P2.Y, data2.distance)]
 
 
 def filterPoints(solutions, corners):
     """Remove solutions if they are not whithin the perimeter.
 
-    This function use shapely as the mathematical computaions for non rectangular
-    shapes are quite heavy.
+    The perimeter is compiled to a Garden (see garden.py) and all the
+    candidates are tested at once against the edges of its polygon.
 
     Args:
-        solutions: A list of candidate points.
+        solutions: A list of candidate points or a PointArray.
 
-        corners: The perimeter of the garden (list of LEDs).
+        corners: The perimeter of the garden (Garden or list of LEDs).
 
     Returns:
-        A list of points filtered.
+        A list of points filtered, or a PointArray if solutions is one.
     """
-    coords = []
-    for i in corners:
-        if i.inPerimeter:
-            coords.append((i.point.X, i.point.Y))
-
-    polygon = shapely.geometry.polygon.Polygon(coords)
-
-    solutions_2 = [value.toShapely() for value in solutions
-                   if polygon.contains(value.toShapely())]
-
-    return [Point(v.x, v.y) for v in solutions_2]
+    garden = compileGarden(corners)
+    if isinstance(solutions, PointArray):
+        return solutions[garden.contains(solutions.X, solutions.Y)]
+    if not solutions:
+        return []
+    mask = garden.contains([p.X for p in solutions], [p.Y for p in solutions])
+    return [value for (value, inside) in zip(solutions, mask) if inside]
 
 
 def isAdjacent(color1, color2, perimeter):
@@ -181,8 +340,10 @@ def isAdjacent(color1, color2, perimeter):
         True if the two colors are adjacents. False otherwise.
     """
     if color1 == color2:
-        print('Bad datas, not possible')
+        logger.warning('Bad datas, not possible')
         return False
+    if isinstance(perimeter, Garden):
+        return perimeter.pair(color1, color2).adjacent
     count = 0
     start = False
     for i in perimeter:
@@ -209,6 +370,8 @@ def vectorFromColors(led1, led2, perimeter):
     Returns:
         The vector from led1 to led2
     """
+    if isinstance(perimeter, Garden):
+        return perimeter.pair(led1.color, led2.color).side
     if not isAdjacent(led1.color, led2.color, perimeter):
         return led2.point.minus(led1.point)
     count = 0
@@ -229,6 +392,16 @@ def vectorFromColors(led1, led2, perimeter):
             if firstColorInFirst else led1.point.minus(led2.point))
 
 
+def _ledPair(led1, led2, perimeter):
+    """Get the LEDPair of two LEDs, from the table of a Garden if possible."""
+    if isinstance(perimeter, Garden):
+        return perimeter.pair(led1.color, led2.color)
+    side = vectorFromColors(led1, led2, perimeter)
+    return LEDPair(isAdjacent(led1.color, led2.color, perimeter), side,
+                   rotateVector(side, 90),
+                   abs(led1.point.distance(led2.point)))
+
+
 def distanceFromAngles(data1, data2, dirInit, angleNorth, angleToDirection,
                        perimeter):
     """Distance computation from angle
@@ -268,19 +441,25 @@ def distanceFromAngles(data1, data2, dirInit, angleNorth, angleToDirection,
         A pair of distance (x y) from the robot to respectively (led1 led2).
     """
 
-    vect1 = rotateVector(dirInit, data1.angle)
-    vect2 = rotateVector(dirInit, data2.angle)
+    return _distancesOfPair(data1.angle, data2.angle,
+                            _ledPair(data1.led, data2.led, perimeter),
+                            dirInit)
+
+
+def _distancesOfPair(angle1, angle2, pair, dirInit):
+    """distanceFromAngles from the angles of the datas and their LEDPair."""
+    vect1 = rotateVector(dirInit, angle1)
+    vect2 = rotateVector(dirInit, angle2)
     # By convention we choose the vectors of the sides in a clockwise
     # way if they are adjacent. We will then only need a rotation in a counter
     # clockwise way to always have a vector facing the outside of the perimeter
-    vectIni = vectorFromColors(data1.led, data2.led, perimeter)
-    vectPerpendicular = rotateVector(vectIni, 90)
+    vectPerpendicular = pair.perpendicular
     angle1 = angleBetween2Vects(vect1, vectPerpendicular)
     angle2 = angleBetween2Vects(vect2, vectPerpendicular)
 
     if angle1 < angle2:
         angle1, angle2 = angle2, angle1
-    distance = abs(data1.led.point.distance(data2.led.point))
+    distance = pair.baseline
     # if the two angles have different signs their product will be negative
     if angle1 * angle2 < 0:
         x = distance / (1 + math.tan(math.radians(abs(angle2))) /
@@ -293,14 +472,156 @@ def distanceFromAngles(data1, data2, dirInit, angleNorth, angleToDirection,
         diff = math.radians(abs(angle1) - abs(angle2))
         ret = math.sin(diff)
         if ret == 0.0:
-            print("oooops")
+            logger.debug("Degenerate angles, no distance")
             return (0, 0)
         x = distance * math.cos(math.radians(angle2)) / math.sin(diff)
         y = distance * math.cos(math.radians(angle1)) / math.sin(diff)
         return (x, y)
 
 
-def compute2Data(data1, data2, *args):
+def distancesFromDirections(directions1, directions2, baselines):
+    """Distance computation from the directions of the bearings.
+
+    Trigonometry free version of the distance computation: the robot R is
+    at the intersection of the two bearing lines,
+    R = LED1 - dist1 * direction1 = LED2 - dist2 * direction2,
+    which is solved with cross products. Unlike **distanceFromAngles** the
+    order of the datas does not matter.
+
+    Args:
+        directions1: (N, 2) array-like of the unit vectors from the robot to
+                     the first LEDs (see geometry.unitVectors).
+
+        directions2: (N, 2) array-like of the unit vectors from the robot to
+                     the second LEDs.
+
+        baselines: (N, 2) array-like of the vectors from the first LEDs to
+                   the second LEDs.
+
+    Returns:
+        Two (N,) arrays of distances to the first and the second LEDs.
+        Degenerate pairs (parallel bearings, or LEDs behind the robot) get
+        a null distance.
+    """
+    sine = cross(directions1, directions2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dist1 = cross(directions2, baselines) / sine
+        dist2 = cross(directions1, baselines) / sine
+    degenerate = ~((dist1 > 0) & (dist2 > 0) & np.isfinite(dist1) &
+                   np.isfinite(dist2))
+    dist1[degenerate] = 0.0
+    dist2[degenerate] = 0.0
+    return (dist1, dist2)
+
+
+def pairQuality(directions1, directions2, baselines):
+    """Quality of the position given by pairs of bearings.
+
+    The error on the crossing of two bearing lines grows as the angle
+    between them gets small (geometric dilution of precision), and a
+    short baseline between the LEDs amplifies the noise of the camera.
+    The quality is |sin(angle between the bearings)| * baseline: 0 for
+    parallel bearings, larger is better.
+
+    Args:
+        directions1, directions2: (N, 2) array-likes of the unit vectors
+                                  from the robot to the LEDs.
+
+        baselines: (N, 2) array-like of the vectors between the LEDs.
+
+    Returns:
+        A (N,) array of qualities (meter).
+    """
+    baselines = np.asarray(baselines, dtype=np.float64)
+    return (np.abs(cross(directions1, directions2)) *
+            np.hypot(baselines[..., 0], baselines[..., 1]))
+
+
+def _combineDistances(measured, heights, computed):
+    """Combine measured and computed distances like Data.adjustDistance.
+
+    Unlike Data.adjustDistance the datas are left untouched, so the same
+    Data can be shared by several pairs.
+    """
+    with np.errstate(invalid='ignore'):
+        adjusted = np.cos(np.arcsin(heights / measured)) * measured
+    return np.where(np.isnan(measured), computed, (adjusted + computed) / 2)
+
+
+def _candidatesInGarden(candidates, garden, watch, rounding=True):
+    """Round the candidates and keep those within the perimeter.
+
+    Args:
+        candidates: (M, 2) array of coordinates, see
+                    CircleIntersections.candidates.
+    """
+    if rounding:
+        candidates = np.round(candidates, PRECISION)
+    watch.lap(INTERSECTION, len(candidates))
+    inside = garden.contains(candidates[:, 0], candidates[:, 1])
+    res = PointArray(candidates[inside])
+    watch.lap(PERIMETER, len(res))
+    return res
+
+
+# Up to this number of pairs the circles are intersected one by one with
+# scalar math (see _intersect2Circles), the arrays of intersectCircles only
+# pay off for larger batches.
+_SCALAR_PAIRS = 3
+
+
+def computePairs(pairs, dirInit, angleNorth, angleToDirection, perimeter,
+                 hook=None):
+    """Compute the position candidates of several pairs of datas at once.
+
+    The distances are computed pair by pair (see **distanceFromAngles**)
+    then the circles are intersected: one by one for a few pairs (see
+    _SCALAR_PAIRS), in a single call to **intersectCircles** otherwise.
+
+    Args:
+        pairs: A list of (Data, Data) tuples. Each pair must be ordered as
+               seen by the camera from left to right.
+
+        dirInit, angleNorth, angleToDirection, perimeter:
+               See distanceFromAngles.
+
+        hook: Called at the end of each stage, see Stopwatch.
+
+    Returns:
+        A PointArray of candidate positions for the actual location.
+    """
+    watch = stopwatch(hook)
+    circles = []
+    for (data1, data2) in pairs:
+        (dist1, dist2) = distanceFromAngles(data1, data2, dirInit, angleNorth,
+                                            angleToDirection, perimeter)
+        circles.append((data1.led.point.X, data1.led.point.Y,
+                        data1.adjustDistance(dist1),
+                        data2.led.point.X, data2.led.point.Y,
+                        data2.adjustDistance(dist2)))
+    watch.lap(DISTANCES, len(pairs))
+    return _intersectPairs(circles, compileGarden(perimeter), watch)
+
+
+def _intersectPairs(circles, garden, watch):
+    """Candidates within the garden of a list of pairs of circles.
+
+    Args:
+        circles: List of tuples (x1, y1, r1, x2, y2, r2).
+    """
+    if len(circles) <= _SCALAR_PAIRS:
+        candidates = np.array([point for circle in circles
+                               for point in _intersect2Circles(*circle)],
+                              dtype=np.float64).reshape(-1, 2)
+    else:
+        circles = np.array(circles, dtype=np.float64)
+        candidates = intersectCircles(circles[:, 0:2], circles[:, 2],
+                                      circles[:, 3:5],
+                                      circles[:, 5]).candidates()
+    return _candidatesInGarden(candidates, garden, watch)
+
+
+def compute2Data(data1, data2, *args, hook=None):
     """Compute a set of position candidates from 2 datas
 
     Final synthetizing of all the datas related to 2 points and computing.
@@ -313,27 +634,377 @@ def compute2Data(data1, data2, *args):
         *args: dirInit, angleNorth, angleToDirection, perimeter.
                See distanceFromAngles.
 
+        hook: Called at the end of each stage, see Stopwatch.
+
     Returns:
-        A list of candidate positions for the actual location
+        A PointArray of candidate positions for the actual location
     """
-    perimeter = args[-1]
-    (dist1, dist2) = distanceFromAngles(data1, data2, *args)
-    data1.adjustDistance(dist1)
-    data2.adjustDistance(dist2)
-    res = getPos2Dist(data1, data2)
-    return filterPoints(res, perimeter)
+    return computePairs([(data1, data2)], *args, hook=hook)
 
 
-def compute3Data(data1, data2, data3, *args):
+def compute3Data(data1, data2, data3, *args, hook=None):
     """Synthetize the position computations for 3 Datas instances.
 
     See **Compute2Data** for the arguments and return value.
     """
-    res1 = compute2Data(data1, data2, *args)
-    res2 = compute2Data(data2, data3, *args)
-    res3 = compute2Data(data1, data3, *args)
-    res = res1 + res2 + res3
-    return res
+    return computePairs([(data1, data2), (data2, data3), (data1, data3)],
+                        *args, hook=hook)
+
+
+def triangulate(datas, dirInit, angleNorth, angleToDirection, perimeter,
+                hook=None):
+    """Compute the position candidates from the first two or three datas.
+
+    Same pairs and results as **compute2Data** (two datas) and
+    **compute3Data** (three datas or more). The datas can be given as an
+    ObservationBatch of a single frame (see observations.py): its columns
+    are read directly and no Data instance is built.
+
+    Args:
+        datas: A list of at least two Data instances (ordered as seen by
+               the camera from left to right), or an ObservationBatch.
+
+        dirInit, angleNorth, angleToDirection, perimeter:
+               See distanceFromAngles.
+
+        hook: Called at the end of each stage, see Stopwatch.
+
+    Returns:
+        A PointArray of candidate positions for the actual location.
+    """
+    if not isinstance(datas, ObservationBatch):
+        if len(datas) == 2:
+            return compute2Data(*datas, dirInit, angleNorth,
+                                angleToDirection, perimeter, hook=hook)
+        return compute3Data(datas[0], datas[1], datas[2], dirInit,
+                            angleNorth, angleToDirection, perimeter,
+                            hook=hook)
+    watch = stopwatch(hook)
+    garden = compileGarden(perimeter)
+    count = min(len(datas), 3)
+    colors = [Color(color) for color in datas.colors[:count].tolist()]
+    angles = datas.angles[:count].tolist()
+    centers = datas.centers[:count].tolist()
+    heights = datas.heights[:count].tolist()
+    # Updated pair after pair, as Data.adjustDistance does
+    distances = [None if math.isnan(distance) else distance
+                 for distance in datas.distances[:count].tolist()]
+    pairs = [(0, 1)] if count == 2 else [(0, 1), (1, 2), (0, 2)]
+    circles = []
+    for (i, j) in pairs:
+        (dist1, dist2) = _distancesOfPair(
+            angles[i], angles[j], garden.pair(colors[i], colors[j]), dirInit)
+        distances[i] = adjustedDistance(distances[i], heights[i], dist1)
+        distances[j] = adjustedDistance(distances[j], heights[j], dist2)
+        circles.append((centers[i][0], centers[i][1], distances[i],
+                        centers[j][0], centers[j][1], distances[j]))
+    watch.lap(DISTANCES, len(pairs))
+    return _intersectPairs(circles, garden, watch)
+
+
+def computeAllPairs(datas, dirInit, angleNorth, angleToDirection, perimeter,
+                    maxPairs=None, hook=None, rounding=True, gate=None):
+    """Compute the position candidates from all the pairs of datas.
+
+    Every pair of datas of different colors is evaluated, in any order.
+    The datas can be given as an ObservationBatch of a single frame (see
+    observations.py). The angles are converted once to unit vectors, then the
+    distances (see **distancesFromDirections**), the intersections and the
+    perimeter filter are computed for all the pairs in a few vectorized
+    calls. The datas are not modified.
+
+    Args:
+        datas: A list of Data instances or an ObservationBatch.
+
+        dirInit, angleNorth, angleToDirection, perimeter:
+               See distanceFromAngles.
+
+        maxPairs: The maximum number of pairs evaluated, the ones with the
+                  best **pairQuality**. None to evaluate all of them.
+
+        hook: Called at the end of each stage, see Stopwatch.
+
+        rounding: Round the candidates to **PRECISION** digits.
+
+        gate: None, or a tuple (center, radius) of the disc where the robot
+              is predicted (see gateDatas). The pairs whose bearings are
+              parallel or cross outside of the disc are skipped before the
+              intersections are computed. maxPairs applies to the pairs
+              left.
+
+    Returns:
+        A PointArray of candidate positions for the actual location.
+    """
+    watch = stopwatch(hook)
+    garden = compileGarden(perimeter)
+    (colors, angles, centers, measured, heights) = _columns(datas)
+    (first, second) = np.triu_indices(len(colors), 1)
+    different = colors[first] != colors[second]
+    (first, second) = (first[different], second[different])
+    if len(first) == 0:
+        return PointArray()
+
+    directions = unitVectors(dirInit, angles)
+    (dist1, dist2) = distancesFromDirections(
+        directions[first], directions[second],
+        centers[second] - centers[first])
+    if gate is not None:
+        # Crossing of the bearing lines of each pair
+        (center, radius) = gate
+        crossings = centers[first] - dist1[:, None] * directions[first]
+        keep = (dist1 > 0) & (np.hypot(crossings[:, 0] - center.X,
+                                       crossings[:, 1] - center.Y) < radius)
+        (first, second) = (first[keep], second[keep])
+        (dist1, dist2) = (dist1[keep], dist2[keep])
+    if maxPairs is not None and len(first) > maxPairs:
+        quality = pairQuality(directions[first], directions[second],
+                              centers[second] - centers[first])
+        # The best pairs, in their original order
+        best = np.sort(np.argsort(-quality, kind='stable')[:maxPairs])
+        (first, second) = (first[best], second[best])
+        (dist1, dist2) = (dist1[best], dist2[best])
+    if len(first) == 0:
+        watch.lap(DISTANCES, 0)
+        return PointArray()
+
+    radii1 = _combineDistances(measured[first], heights[first], dist1)
+    radii2 = _combineDistances(measured[second], heights[second], dist2)
+    watch.lap(DISTANCES, len(first))
+
+    res = intersectCircles(centers[first], radii1, centers[second], radii2)
+    return _candidatesInGarden(res.candidates(), garden, watch, rounding)
+
+
+def _columns(datas):
+    """Arrays (colors, angles, centers, distances, heights) of the datas.
+
+    The datas are a list of Data instances or an ObservationBatch. Unknown
+    distances are NaN.
+    """
+    if isinstance(datas, ObservationBatch):
+        return (datas.colors, datas.angles, datas.centers, datas.distances,
+                datas.heights)
+    colors = np.array([data.led.color.value for data in datas],
+                      dtype=np.int8)
+    angles = np.array([data.angle for data in datas], dtype=np.float64)
+    centers = np.array([(data.led.point.X, data.led.point.Y)
+                        for data in datas], dtype=np.float64).reshape(-1, 2)
+    distances = np.array([np.nan if data.distance is None else data.distance
+                          for data in datas], dtype=np.float64)
+    heights = np.array([data.led.height for data in datas], dtype=np.float64)
+    return (colors, angles, centers, distances, heights)
+
+
+def _toPoint(position, rounding):
+    (x, y) = (float(position[0]), float(position[1]))
+    if rounding:
+        return Point(round(x, PRECISION), round(y, PRECISION))
+    return Point(x, y)
+
+
+def gateDatas(datas, dirInit, center, radius, tolerance=5.0):
+    """Reject the datas inconsistent with a predicted position.
+
+    Seen from anywhere in the disc where the robot is predicted, a LED is
+    in a cone of directions around the direction from the center of the
+    disc. The datas whose bearing is outside of this cone (plus a
+    tolerance for the noise of the camera) are outliers.
+
+    Args:
+        datas: A list of Data instances or an ObservationBatch.
+
+        dirInit: The direction of the robot at initialisation.
+
+        center: The predicted position (Point), usually the last position
+                of the odometry.
+
+        radius: The uncertainty of the predicted position (meter).
+
+        tolerance: The noise allowed on the bearings (degree).
+
+    Returns:
+        The list of the datas kept, in the same order, or an
+        ObservationBatch if datas is one.
+    """
+    if len(datas) == 0:
+        return datas if isinstance(datas, ObservationBatch) else []
+    (_, angles, centers, _, _) = _columns(datas)
+    directions = unitVectors(dirInit, angles)
+    leds = centers - (center.X, center.Y)
+    rho = np.hypot(leds[:, 0], leds[:, 1])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cone = np.arcsin(np.clip(radius / rho, 0.0, 1.0))
+    errors = np.abs(np.arctan2(cross(directions, leds),
+                               dot(directions, leds)))
+    keep = (rho <= radius) | (errors <= cone + math.radians(tolerance))
+    if isinstance(datas, ObservationBatch):
+        return datas.select(keep)
+    return [data for (data, kept) in zip(datas, keep) if kept]
+
+
+def resectLeastSquares(datas, dirInit, start=None, iterations=20,
+                       tolerance=1e-6, damping=1e-3, rounding=True):
+    """Fit the position to all the bearings at once.
+
+    Levenberg-Marquardt resection: the position is the one minimizing the
+    squared differences between the measured bearings and the bearings
+    from the position to the LEDs. Each iteration solves a single 2x2
+    linear system built from every data, so no distance, intersection or
+    vote is needed. The datas do not need to be in any particular order.
+
+    Args:
+        datas: A list of at least two Data instances, or an
+               ObservationBatch.
+
+        dirInit: The direction of the robot at initialisation.
+
+        start: A Point to start from, usually the last known position
+               (Odometry.lastPos). If None the start is the least squares
+               intersection of the bearing lines.
+
+        iterations: The maximum number of iterations.
+
+        tolerance: The iterations stop when the position moves less than
+                   this distance (meter).
+
+        damping: Levenberg-Marquardt damping factor.
+
+        rounding: Round the position to **PRECISION** digits.
+
+    Returns:
+        A Point, or None if there are not enough datas or if the problem is
+        degenerate.
+    """
+    if len(datas) < 2:
+        return None
+    (_, angles, leds, _, _) = _columns(datas)
+    directions = unitVectors(dirInit, angles)
+
+    if start is None:
+        # Intersection of the lines going through each LED with the
+        # direction of its bearing: normal . position = normal . LED
+        normals = np.stack((-directions[:, 1], directions[:, 0]), axis=1)
+        A = normals.T @ normals
+        b = normals.T @ np.einsum('ij,ij->i', normals, leds)
+        if abs(np.linalg.det(A)) < 1e-12:
+            return None
+        position = np.linalg.solve(A, b)
+    else:
+        position = np.array((start.X, start.Y), dtype=np.float64)
+
+    for _ in range(iterations):
+        delta = leds - position
+        rho2 = np.einsum('ij,ij->i', delta, delta)
+        if np.any(rho2 == 0.0):
+            return None
+        # Angle from the measured direction to the predicted one
+        residuals = np.arctan2(cross(directions, delta),
+                               dot(directions, delta))
+        jacobian = np.stack((delta[:, 1] / rho2, -delta[:, 0] / rho2), axis=1)
+        A = jacobian.T @ jacobian
+        A += damping * np.diag(np.diag(A))
+        try:
+            step = np.linalg.solve(A, -jacobian.T @ residuals)
+        except np.linalg.LinAlgError:
+            return None
+        position = position + step
+        if np.hypot(step[0], step[1]) < tolerance:
+            break
+
+    if not np.all(np.isfinite(position)):
+        return None
+    return _toPoint(position, rounding)
+
+
+# Value used in place of an infinite cotangent in resectThreeBearings
+_COT_MAX = 1e8
+
+
+def _cot(direction1, direction2):
+    """Cotangent of the angle from direction1 to direction2."""
+    ((x1, y1), (x2, y2)) = (direction1, direction2)
+    sinus = x1 * y2 - y1 * x2
+    if sinus == 0.0:
+        return _COT_MAX
+    return (x1 * x2 + y1 * y2) / sinus
+
+
+def resectThreeBearings(data1, data2, data3, dirInit, rounding=True):
+    """Closed form position from three bearings (ToTal algorithm).
+
+    Non iterative three object triangulation: the position is obtained in a
+    fixed number of floating point operations, without distances, circle
+    intersections or perimeter filter. The datas can be in any order.
+
+    The problem is degenerate when the robot is on the circle going through
+    the three LEDs (or when the LEDs are aligned): every position on the
+    circle sees the LEDs with the same angles.
+
+    Args:
+        data1, data2, data3: Data instances of three different LEDs.
+
+        dirInit: The direction of the robot at initialisation.
+
+        rounding: Round the position to **PRECISION** digits.
+
+    Returns:
+        A tuple (position, degenerate). position is a Point, or None if
+        degenerate is True.
+    """
+    return resectFirstThree((data1, data2, data3), dirInit, rounding)
+
+
+def resectFirstThree(datas, dirInit, rounding=True):
+    """Closed form position from the first three datas.
+
+    See **resectThreeBearings**, the datas are read as columns (see
+    _columns) so that an ObservationBatch is used without Data instances.
+
+    Args:
+        datas: A list of at least three Data instances of different LEDs,
+               or an ObservationBatch.
+
+        dirInit: The direction of the robot at initialisation.
+
+        rounding: Round the position to **PRECISION** digits.
+
+    Returns:
+        A tuple (position, degenerate), see resectThreeBearings.
+    """
+    if isinstance(datas, ObservationBatch):
+        datas = datas.select(slice(0, 3))
+    else:
+        datas = datas[:3]
+    (_, angles, leds, _, _) = _columns(datas)
+    (u1, u2, u3) = unitVectors(dirInit, angles).tolist()
+    ((x1, y1), (x2, y2), (x3, y3)) = leds.tolist()
+    # Coordinates relative to the second LED
+    x1 -= x2
+    y1 -= y2
+    x3 -= x2
+    y3 -= y2
+
+    t12 = _cot(u1, u2)
+    t23 = _cot(u2, u3)
+    if t12 + t23 == 0.0:
+        return (None, True)
+    t31 = (1 - t12 * t23) / (t12 + t23)
+
+    # Centers of the three circles going through the robot and two LEDs
+    x12 = x1 + t12 * y1
+    y12 = y1 - t12 * x1
+    x23 = x3 - t23 * y3
+    y23 = y3 + t23 * x3
+    x31 = (x3 + x1) + t31 * (y3 - y1)
+    y31 = (y3 + y1) - t31 * (x3 - x1)
+    k31 = x1 * x3 + y1 * y3 + t31 * (x1 * y3 - x3 * y1)
+
+    D = (x12 - x23) * (y23 - y31) - (y12 - y23) * (x23 - x31)
+    if abs(D) < 1e-12:
+        return (None, True)
+    x = x2 + k31 * (y12 - y23) / D
+    y = y2 + k31 * (x23 - x12) / D
+    return (_toPoint((x, y), rounding), False)
 
 
 def hasManyOccurencies(elt, listx):
@@ -354,24 +1025,105 @@ def hasManyOccurencies(elt, listx):
         if elt == i:
             count += 1
     goodPercent = count * 100 / len(listx)
-    print(goodPercent)
+    logger.debug('%.1f%% of similar points', goodPercent)
     return goodPercent >= _threshold
 
 
-def sortData(data_array):
+# Up to this number of points dominantCluster compares every point with the
+# others, like hasManyOccurencies: for the few candidates of a frame it is
+# faster than building the spatial hash.
+_DIRECT_CLUSTER = 16
+
+
+def dominantCluster(coords, cellSize, threshold=80.0):
+    """Find the dominant cluster of a set of points.
+
+    Two points are similar when their coordinates differ by less than
+    cellSize (see Point.__eq__). With a few points, the cluster is made of
+    the points similar to enough of the others, as in
+    **hasManyOccurencies**. With more points, they are bucketed in a grid
+    of square cells (spatial hash): the support of a cell is the number of
+    points in the cell and its 8 neighbours, and the cluster is made of the
+    points similar to the centroid of the cell with the greatest support.
+    The cost is then O(n log n) instead of comparing every point with all
+    the others.
+
+    Args:
+        coords: (N, 2) array-like of coordinates.
+
+        cellSize: The size of the cells, the tolerance of the similarity
+                  (meter).
+
+        threshold: Minimal percentage of the points that the dominant
+                   cluster must contain.
+
+    Returns:
+        A bool mask of the points in the dominant cluster, or None if there
+        is no point or if the cluster is not supported enough.
+    """
+    if len(coords) == 0:
+        return None
+    if len(coords) <= _DIRECT_CLUSTER:
+        if isinstance(coords, np.ndarray):
+            coords = coords.tolist()
+        minimum = threshold * len(coords) / 100.0
+        members = [sum(1 for (x2, y2) in coords
+                       if abs(x1 - x2) < cellSize and
+                       abs(y1 - y2) < cellSize) >= minimum
+                   for (x1, y1) in coords]
+        return np.array(members) if any(members) else None
+
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    cells = np.floor(coords / cellSize).astype(np.int64)
+    cells -= cells.min(axis=0) - 1
+    # Keys are unique for the cells and their neighbours
+    height = cells[:, 1].max() + 2
+    keys = cells[:, 0] * height + cells[:, 1]
+    (uniqueKeys, counts) = np.unique(keys, return_counts=True)
+
+    support = np.zeros(len(uniqueKeys), dtype=np.int64)
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            neighbours = uniqueKeys + dx * height + dy
+            index = np.minimum(np.searchsorted(uniqueKeys, neighbours),
+                               len(uniqueKeys) - 1)
+            found = uniqueKeys[index] == neighbours
+            support[found] += counts[index[found]]
+
+    centroid = coords[keys == uniqueKeys[np.argmax(support)]].mean(axis=0)
+    members = np.all(np.abs(coords - centroid) < cellSize, axis=1)
+    if members.sum() * 100.0 / len(coords) < threshold:
+        return None
+    return members
+
+
+def sortData(data_array, cellSize=Point._threshold, threshold=80.0):
     """Filter the datas in given in parameter if they appear often.
 
+    The most frequent elements are found with **dominantCluster**.
+
     Args:
-        data_array: A list of Points candidates to be the actual
-        location of the robot.
+        data_array: A list of Points or a PointArray of candidates to be the
+        actual location of the robot.
+
+        cellSize: The tolerance of the similarity between two candidates
+                  (meter), see Point.__eq__.
+
+        threshold: Minimal percentage of the candidates that must agree on
+                   the location.
 
     Returns:
-        The mean of the most frequent elements in the list.
+        The mean of the most frequent elements in the list. None if no
+        location is frequent enough.
     """
-    data_array = [x for x in data_array if hasManyOccurencies(x, data_array)]
-    x = 0.0
-    y = 0.0
-    for i in data_array:
-        x += i.X
-        y += i.Y
-    return Point(x / len(data_array), y / len(data_array))
+    if isinstance(data_array, PointArray):
+        coords = data_array.coords
+    else:
+        coords = np.array([(i.X, i.Y) for i in data_array],
+                          dtype=np.float64).reshape(-1, 2)
+    members = dominantCluster(coords, cellSize, threshold)
+    if members is None:
+        return None
+    kept = coords[members]
+    (x, y) = kept.sum(axis=0) / len(kept)
+    return Point(float(x), float(y))
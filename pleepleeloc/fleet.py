@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import copy
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from .garden import Garden
+from .geometry import Point
+from .location import TRIANGULATION, Location, Odometry
+from .utils import Color, datasFromBearings
+
+"""
+Localization service for several robots in the same garden.
+
+The perimeter is compiled once (see garden.py) and shared by the Locations
+of all the robots. The frames of the robots are computed concurrently in a
+pool of processes or of threads: each frame is an independent task, so a
+slow frame of a robot does not block the frames of the others. The
+computation of a frame is mostly Python code holding the GIL, so only the
+processes scale with the number of cores; the threads avoid sending the
+frames to other processes when there are few robots.
+
+A frame is given as raw values: the angle of the magnetic captor, the
+odometry and the bearings as tuples (color, angle) or (color, angle,
+distance). They are converted to Data instances by the workers.
+"""
+
+# Pools available for the FleetServer
+# Processes, each one compiles the Garden once when it starts.
+PROCESSES = 'processes'
+# Threads sharing the Garden of the server, limited to one core by the GIL.
+THREADS = 'threads'
+
+# Garden and Locations of a worker process (see _initWorker).
+_worker = {}
+
+
+def _initWorker(leds, rectangle):
+    """Compile the garden once in a worker process."""
+    _worker['garden'] = Garden(leds, rectangle)
+    _worker['locations'] = {}
+
+
+def _computeRemote(robot, config, angleToDirection, odometry, bearings):
+    """Compute a frame in a worker process.
+
+    Args:
+        robot: The name of the robot.
+
+        config: Tuple (angleNorth, dirInit, height, options) of the
+                Location of the robot.
+
+        angleToDirection: The angle of the magnetic captor.
+
+        odometry: Tuple (lastX, lastY, dist) or None.
+
+        bearings: List of tuples (color value, angle[, distance]).
+
+    Returns:
+        The position (Point) or None.
+    """
+    (cached, location) = _worker['locations'].get(robot, (None, None))
+    if cached != config:
+        (angleNorth, dirInit, height, options) = config
+        location = Location(angleNorth, dirInit, height, _worker['garden'],
+                            **dict(options))
+        _worker['locations'][robot] = (config, location)
+    if odometry is not None:
+        odometry = Odometry(Point(odometry[0], odometry[1]), odometry[2])
+    datas = datasFromBearings(bearings, location.angleNorth, angleToDirection,
+                              location.garden)
+    return location.computePos(angleToDirection, odometry, *datas)
+
+
+class FleetServer:
+    """Compute the positions of several robots sharing a garden.
+
+    Attributes:
+        garden: The Garden shared by all the robots.
+
+        pool: THREADS or PROCESSES.
+
+        robots: Dictionary mapping the name of each robot to its Location.
+
+        executor: The concurrent.futures executor running the frames.
+    """
+
+    def __init__(self, *perimeter, pool=PROCESSES, workers=None):
+        """Initialize a FleetServer from a list of LEDs
+
+        Args:
+            perimeter: The LEDs sorted clockwise, or a Garden.
+            pool: PROCESSES (default) or THREADS.
+            workers: The number of workers, None for the default of
+                     concurrent.futures.
+        """
+        if len(perimeter) == 1 and isinstance(perimeter[0], Garden):
+            self.garden = perimeter[0]
+        else:
+            self.garden = Garden(perimeter)
+        self.pool = pool
+        self.robots = {}
+        self._configs = {}
+        if pool == THREADS:
+            self.executor = ThreadPoolExecutor(workers)
+        elif pool == PROCESSES:
+            self.executor = ProcessPoolExecutor(
+                workers, initializer=_initWorker,
+                initargs=(self.garden.leds, self.garden.rectangle))
+        else:
+            raise ValueError('Unknown pool: %s' % pool)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def addRobot(self, robot, angleNorth, dirInit, height,
+                 solver=TRIANGULATION, maxPairs=None, rounding=True):
+        """Register a robot.
+
+        Args:
+            robot: The name of the robot (any hashable value).
+
+            angleNorth, dirInit, height: The datas of initialisation of the
+                                         robot (see location.Location).
+
+            solver, maxPairs, rounding: The options of its Location.
+
+        Returns:
+            The Location of the robot.
+        """
+        options = (('solver', solver), ('maxPairs', maxPairs),
+                   ('rounding', rounding))
+        location = Location(angleNorth, dirInit, height, self.garden,
+                            **dict(options))
+        self.robots[robot] = location
+        self._configs[robot] = (angleNorth, tuple(dirInit), height, options)
+        return location
+
+    def submit(self, robot, angleToDirection, odometry, *bearings):
+        """Schedule the computation of a frame.
+
+        Args:
+            robot: The name of a registered robot.
+
+            angleToDirection: The angle of the magnetic captor.
+
+            odometry: An Odometry instance, or None.
+
+            bearings: Tuples (color, angle) or (color, angle, distance).
+                      The color is a Color or its value.
+
+        Returns:
+            A Future of the position (Point or None).
+
+        Raises:
+            KeyError: The robot is not registered.
+        """
+        config = self._configs[robot]
+        bearings = [(Color(bearing[0]).value,) + tuple(bearing[1:])
+                    for bearing in bearings]
+        if self.pool == THREADS:
+            # A copy per frame, so that the frames of a robot can be
+            # computed concurrently.
+            location = copy.copy(self.robots[robot])
+            return self.executor.submit(self._computeLocal, location,
+                                        angleToDirection, odometry, bearings)
+        if odometry is not None:
+            odometry = (odometry.lastPos.X, odometry.lastPos.Y, odometry.dist)
+        return self.executor.submit(_computeRemote, robot, config,
+                                    angleToDirection, odometry, bearings)
+
+    @staticmethod
+    def _computeLocal(location, angleToDirection, odometry, bearings):
+        datas = datasFromBearings(bearings, location.angleNorth,
+                                  angleToDirection, location.garden)
+        return location.computePos(angleToDirection, odometry, *datas)
+
+    def computeFrames(self, frames):
+        """Compute many frames concurrently.
+
+        Args:
+            frames: Iterable of tuples (robot, angleToDirection, odometry,
+                    bearings), see **submit**.
+
+        Returns:
+            The list of the positions, in the order of the frames.
+        """
+        futures = [self.submit(robot, angleToDirection, odometry, *bearings)
+                   for (robot, angleToDirection, odometry, bearings)
+                   in frames]
+        return [future.result() for future in futures]
+
+    def close(self):
+        """Wait for the pending frames and stop the workers."""
+        self.executor.shutdown()
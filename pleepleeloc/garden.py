@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+from .geometry import (isConvex, pointsInConvexPolygon, pointsInPolygon,
+                       polygonEdges, rotateVector)
+from .utils import Color
+
+
+class LEDPair:
+    """Map-derived datas of an ordered pair of LEDs.
+
+    Attributes:
+        adjacent: True if the two LEDs are adjacent in the perimeter.
+
+        side: The clockwise vector of the side between the two LEDs if they
+              are adjacent, the vector from the first LED to the second one
+              otherwise. See compute.vectorFromColors.
+
+        perpendicular: The side rotated by 90 degrees. For adjacent LEDs it
+                       faces the outside of the perimeter.
+
+        baseline: The distance between the two LEDs.
+    """
+
+    def __init__(self, adjacent, side, perpendicular, baseline):
+        self.adjacent = adjacent
+        self.side = side
+        self.perpendicular = perpendicular
+        self.baseline = baseline
+
+
+class Garden:
+    """Compiled representation of the perimeter of the garden.
+
+    Everything that only depends on the map is computed once at
+    initialisation so that it does not have to be rebuilt for every frame.
+    A Garden behaves like the tuple of its LEDs, so it can be given to the
+    compute functions wherever a perimeter is expected.
+
+    Attributes:
+        leds: Tuple of LEDs. The corners MUST be sorted clockwise.
+
+        polygon: Shapely polygon built from the LEDs in the perimeter.
+                 shapely is only imported when it is first used.
+
+        vertices: (E, 2) array of the coordinates of the LEDs in the
+                  perimeter, the vertices of the polygon.
+
+        edges: The edges of the polygon (see geometry.polygonEdges).
+
+        bounds: Bounding box of the polygon (minx, miny, maxx, maxy).
+
+        ledByColor: List of LEDs indexed by the value of their Color.
+                    None for the colors that are not in the garden.
+
+        ledCoords: (len(Color), 2) array of the coordinates of the LEDs
+                   indexed by the value of their Color, NaN for the colors
+                   that are not in the garden.
+
+        ledHeights: (len(Color),) array of the heights of the LEDs indexed
+                    the same way.
+
+        pairs: Dictionary mapping each ordered pair of colors (Color, Color)
+               to its LEDPair. It is built on first access, so a Garden
+               compiled for a single call does not pay for it.
+
+        rectangle: True if the perimeter is a rectangle aligned with the
+                   axes. The containment test is then four comparisons.
+
+        convex: True if the perimeter is convex. The containment test is
+                then a half-plane test per edge.
+    """
+
+    def __init__(self, perimeter, rectangle=None):
+        """Initialize a Garden from a list of LEDs
+
+        Args:
+            perimeter: The list of LEDs.
+
+            rectangle: None to detect whether the perimeter is a rectangle
+                       aligned with the axes, True to require it, False to
+                       always use the general polygon.
+
+        Raises:
+            ValueError: Two LEDs have the same color, there are less than
+                        3 LEDs in the perimeter, or rectangle is True and
+                        the perimeter is not a rectangle.
+        """
+        self.leds = tuple(perimeter)
+        colors = len(Color)
+        self.ledByColor = [None] * colors
+        self.ledCoords = np.full((colors, 2), np.nan)
+        self.ledHeights = np.full(colors, np.nan)
+        for led in self.leds:
+            value = led.color.value
+            if self.ledByColor[value] is not None:
+                raise ValueError('The LEDs must have different colors')
+            self.ledByColor[value] = led
+            self.ledCoords[value] = (led.point.X, led.point.Y)
+            self.ledHeights[value] = led.height
+        coords = [(i.point.X, i.point.Y) for i in self.leds if i.inPerimeter]
+        if len(coords) < 3:
+            raise ValueError('The perimeter needs at least 3 LEDs')
+        self._polygon = None
+        self.vertices = np.array(coords, dtype=np.float64)
+        self.edges = polygonEdges(self.vertices)
+        (xs, ys) = zip(*coords)
+        self.bounds = (float(min(xs)), float(min(ys)), float(max(xs)),
+                       float(max(ys)))
+        isRectangle = isAxisAlignedRectangle(self.vertices)
+        if rectangle and not isRectangle:
+            raise ValueError('The perimeter is not a rectangle aligned with '
+                             'the axes')
+        self.rectangle = isRectangle if rectangle is None else rectangle
+        self.convex = isConvex(self.edges)
+        self._pairs = None
+
+    @property
+    def polygon(self):
+        """Shapely polygon of the perimeter, built on first access."""
+        if self._polygon is None:
+            import shapely.geometry
+            self._polygon = shapely.geometry.polygon.Polygon(
+                self.vertices.tolist())
+        return self._polygon
+
+    @property
+    def pairs(self):
+        """Table of the LEDPairs, built on first access."""
+        if self._pairs is None:
+            self._pairs = self._buildPairs()
+        return self._pairs
+
+    def __iter__(self):
+        return iter(self.leds)
+
+    def __len__(self):
+        return len(self.leds)
+
+    def __getitem__(self, index):
+        return self.leds[index]
+
+    def _buildPairs(self):
+        """Build the table of all the ordered pairs of LEDs."""
+        pairs = {}
+        for (i, led1) in enumerate(self.leds):
+            for (j, led2) in enumerate(self.leds):
+                if led1.color == led2.color:
+                    continue
+                # Same convention as the perimeter scan of
+                # compute.isAdjacent: neighbours in the tuple order.
+                adjacent = abs(i - j) == 1
+                if adjacent and j < i:
+                    side = led1.point.minus(led2.point)
+                else:
+                    side = led2.point.minus(led1.point)
+                pairs[(led1.color, led2.color)] = LEDPair(
+                    adjacent, side, rotateVector(side, 90),
+                    abs(led1.point.distance(led2.point)))
+        return pairs
+
+    def getLED(self, color):
+        """Get the LED of a given color.
+
+        Args:
+            color: A Color instance.
+
+        Returns:
+            The LED of this color.
+
+        Raises:
+            ValueError: There is no LED of this color in the garden.
+        """
+        led = self.ledByColor[color.value]
+        if led is None:
+            raise ValueError('Color not found')
+        return led
+
+    def pair(self, color1, color2):
+        """Get the LEDPair of two colors.
+
+        Args:
+            color1: Color of the first LED.
+            color2: Color of the second LED.
+
+        Returns:
+            A LEDPair instance.
+        """
+        return self.pairs[(color1, color2)]
+
+    def contains(self, xs, ys):
+        """Test whether several points are strictly inside the perimeter.
+
+        The points outside of the bounding box are discarded with simple
+        comparisons. For a rectangle this is the result, otherwise the
+        remaining points are tested against the edges of the polygon (see
+        geometry.pointsInConvexPolygon and geometry.pointsInPolygon). The
+        result is the same as the contains predicate of shapely.
+
+        Args:
+            xs: Array-like of x coordinates.
+            ys: Array-like of y coordinates.
+
+        Returns:
+            A bool array, True for the points inside the perimeter.
+        """
+        xs = np.asarray(xs, dtype=np.float64).reshape(-1)
+        ys = np.asarray(ys, dtype=np.float64).reshape(-1)
+        (minx, miny, maxx, maxy) = self.bounds
+        mask = (xs > minx) & (xs < maxx) & (ys > miny) & (ys < maxy)
+        if self.rectangle or not mask.any():
+            return mask
+        index = np.flatnonzero(mask)
+        if self.convex:
+            mask[index] = pointsInConvexPolygon(xs[index], ys[index],
+                                                self.edges)
+        else:
+            mask[index] = pointsInPolygon(xs[index], ys[index], self.edges)
+        return mask
+
+
+def isAxisAlignedRectangle(vertices):
+    """Check whether a polygon is a rectangle aligned with the axes.
+
+    Args:
+        vertices: (E, 2) array-like of the vertices of the polygon.
+
+    Returns:
+        True if the polygon has four distinct corners on two x and two y
+        coordinates, each side being horizontal or vertical.
+    """
+    vertices = np.asarray(vertices, dtype=np.float64)
+    if len(vertices) != 4:
+        return False
+    if len(set(vertices[:, 0])) != 2 or len(set(vertices[:, 1])) != 2:
+        return False
+    if len(set(map(tuple, vertices))) != 4:
+        return False
+    ends = np.concatenate((vertices[1:], vertices[:1]))
+    # Exactly one coordinate changes along each side
+    return bool(np.all((vertices == ends).sum(axis=1) == 1))
+
+
+def compileGarden(perimeter):
+    """Get the Garden of a perimeter.
+
+    Args:
+        perimeter: A Garden instance or a list of LEDs.
+
+    Returns:
+        The perimeter itself if it is already compiled, a new Garden
+        otherwise.
+    """
+    if isinstance(perimeter, Garden):
+        return perimeter
+    return Garden(perimeter)
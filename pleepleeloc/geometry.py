@@ -7,34 +7,45 @@
 #           computations                                 #
 ##########################################################
 
-import shapely.geometry
+import numpy as np
 
+from collections import namedtuple
+from fractions import Fraction
 from math import atan2, cos, degrees, radians, sin, sqrt
 
 PRECISION = 3
 
 
-class Point:
+class Point(namedtuple('Point', ('X', 'Y'))):
     """Simple point representation.
 
     Contains utility functions for points manipulation.
+    Points are immutable tuples (x, y) without __dict__ to stay small and
+    cheap to create, as many of them are created for each computation.
+
+    Points are not hashable: == compares the points with a tolerance (see
+    **_threshold**), which no hash can follow. Use compute.dominantCluster
+    to group similar points.
 
     Attributes:
         X: x coordinate of the point.
         Y: y coordinate of the point.
     """
 
+    __slots__ = ()
+
     # Thresold to determine that two points are similar (distance < 15cm)
     _threshold = 0.1
 
-    def __init__(self, x, y):
-        """Initialize point with coordinates x and y."""
-        self.X = x
-        self.Y = y
+    # __eq__ is not exact, see the docstring of the class
+    __hash__ = None
 
     def __str__(self):
         return "Point(%s,%s)" % (self.X, self.Y)
 
+    def __repr__(self):
+        return str(self)
+
     def distance(self, other):
         """Compute distance between two points
 
@@ -57,6 +68,10 @@ class Point:
         return (abs(self.X - other.X) < self._threshold
                 and abs(self.Y - other.Y) < self._threshold)
 
+    def __ne__(self, other):
+        # The != of tuple would compare the coordinates exactly
+        return not self == other
+
     def minus(self, other):
         """Performs the substraction of two points.
 
@@ -80,9 +95,99 @@ class Point:
         Returns:
             A Shapely Point object.
         """
+        # Imported on demand, the computations do not need shapely
+        import shapely.geometry
         return shapely.geometry.point.Point(self.X, self.Y)
 
 
+class PointArray:
+    """Array of points stored in a contiguous buffer.
+
+    The coordinates of N points are stored in a single (N, 2) float64 array
+    so that batched computations can pass candidates around without
+    creating a Point per candidate. Indexing with an integer gives a Point,
+    indexing with a slice or a mask gives a PointArray.
+
+    Attributes:
+        coords: (N, 2) C-contiguous float64 array of the coordinates.
+    """
+
+    __slots__ = ('coords',)
+
+    def __init__(self, coords=()):
+        """Initialize a PointArray from an array-like of coordinates."""
+        self.coords = np.ascontiguousarray(
+            np.asarray(coords, dtype=np.float64).reshape(-1, 2))
+
+    @classmethod
+    def fromPoints(cls, points):
+        """Build a PointArray from a list of Points."""
+        return cls([(point.X, point.Y) for point in points])
+
+    @property
+    def X(self):
+        """Array of the x coordinates."""
+        return self.coords[:, 0]
+
+    @property
+    def Y(self):
+        """Array of the y coordinates."""
+        return self.coords[:, 1]
+
+    def __len__(self):
+        return len(self.coords)
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            (x, y) = self.coords[index]
+            return Point(float(x), float(y))
+        return PointArray(self.coords[index])
+
+    def __iter__(self):
+        for (x, y) in self.coords.tolist():
+            yield Point(x, y)
+
+    def __contains__(self, point):
+        return bool(np.any(
+            (np.abs(self.coords[:, 0] - point.X) < Point._threshold) &
+            (np.abs(self.coords[:, 1] - point.Y) < Point._threshold)))
+
+    def __add__(self, other):
+        if not isinstance(other, PointArray):
+            other = PointArray.fromPoints(other)
+        return PointArray(np.concatenate((self.coords, other.coords)))
+
+    def __radd__(self, other):
+        return PointArray.fromPoints(other) + self
+
+    def __str__(self):
+        return "PointArray(%s)" % ", ".join(str(point) for point in self)
+
+    def toPoints(self):
+        """Convert to a list of Points."""
+        return list(self)
+
+    def distances(self, point):
+        """Distances from each point to another point.
+
+        Args:
+            point: A Point.
+
+        Returns:
+            A (N,) array of floating point approximations of **PRECISION**
+            digits, as Point.distance.
+        """
+        return np.round(np.hypot(self.coords[:, 0] - point.X,
+                                 self.coords[:, 1] - point.Y), PRECISION)
+
+    def mean(self):
+        """The mean point, None if the array is empty."""
+        if len(self.coords) == 0:
+            return None
+        (x, y) = self.coords.mean(axis=0)
+        return Point(float(x), float(y))
+
+
 # Rotate a vector in a plane by an angle alpha in degree.
 # The rotation is clockwise.
 # The formula is obtained by multiplying the rotation matrix with
@@ -119,3 +224,182 @@ def angleBetween2Vects(vect1, vect2):
     (x2, y2) = vect2
     angle = atan2(y2, x2) - atan2(y1, x1)
     return round(degrees(angle), PRECISION)
+
+
+# Directions are represented by unit vectors in the computations: the angles
+# in degree are converted once when the datas enter the computation and the
+# rest of the pipeline only uses products of vectors (no trigonometry).
+def unitVectors(vect, alphas):
+    """Unit vectors of a vector rotated clockwise by several angles.
+
+    Same rotation as **rotateVector**, normalized and without rounding.
+    This is the conversion from the degrees of the API to the unit vectors
+    used in the computations.
+
+    Args:
+        vect: a vector composed of two values (x y).
+        alphas: array-like of N angles (degree).
+
+    Returns:
+        A (N, 2) array of unit vectors.
+    """
+    (x, y) = vect
+    norm = sqrt(x**2 + y**2)
+    alphas = np.radians(np.asarray(alphas, dtype=np.float64))
+    cos = np.cos(alphas)
+    sin = np.sin(alphas)
+    return np.stack(((x * cos + y * sin) / norm, (y * cos - x * sin) / norm),
+                    axis=-1)
+
+
+def cross(vects1, vects2):
+    """Cross products of vectors: the sine of the angle from vects1 to
+    vects2 for unit vectors.
+
+    Args:
+        vects1, vects2: (..., 2) array-likes of vectors.
+
+    Returns:
+        An array of the cross products.
+    """
+    vects1 = np.asarray(vects1, dtype=np.float64)
+    vects2 = np.asarray(vects2, dtype=np.float64)
+    return vects1[..., 0] * vects2[..., 1] - vects1[..., 1] * vects2[..., 0]
+
+
+def dot(vects1, vects2):
+    """Dot products of vectors: the cosine of the angle between vects1 and
+    vects2 for unit vectors.
+
+    Args:
+        vects1, vects2: (..., 2) array-likes of vectors.
+
+    Returns:
+        An array of the dot products.
+    """
+    vects1 = np.asarray(vects1, dtype=np.float64)
+    vects2 = np.asarray(vects2, dtype=np.float64)
+    return vects1[..., 0] * vects2[..., 0] + vects1[..., 1] * vects2[..., 1]
+
+
+# Relative error bound of the orientation computed with floats
+# (J. R. Shewchuk, Adaptive Precision Floating-Point Arithmetic).
+_ORIENTATION_ERROR = (3.0 + 16.0 * 2.0**-53) * 2.0**-53
+
+
+def polygonEdges(vertices):
+    """Edges of a polygon, for pointsInPolygon.
+
+    Args:
+        vertices: (E, 2) array-like of the vertices of the polygon, the
+                  polygon is closed implicitly.
+
+    Returns:
+        A (4, E) array of the coordinates of the edges (x1 y1 x2 y2).
+    """
+    vertices = np.asarray(vertices, dtype=np.float64)
+    ends = np.concatenate((vertices[1:], vertices[:1]))
+    return np.concatenate((vertices.T, ends.T))
+
+
+def _orientations(edges, xs, ys):
+    """Sign of the orientation of the points relative to the edges.
+
+    1 if the point is on the left of the edge (x1 y1) -> (x2 y2), -1 on the
+    right, 0 on the line. The sign is exact: the cases too close to call
+    with floats are computed again with fractions.
+    """
+    (x1, y1, x2, y2) = edges
+    left = (x2 - x1) * (ys - y1)
+    right = (y2 - y1) * (xs - x1)
+    side = left - right
+    signs = np.sign(side)
+    ambiguous = np.abs(side) <= _ORIENTATION_ERROR * (np.abs(left) +
+                                                      np.abs(right))
+    if ambiguous.any():
+        for (i, j) in zip(*np.nonzero(ambiguous)):
+            (ax, ay, bx, by, px, py) = (Fraction(float(value)) for value in (
+                x1[j], y1[j], x2[j], y2[j], xs[i, 0], ys[i, 0]))
+            exact = (bx - ax) * (py - ay) - (by - ay) * (px - ax)
+            signs[i, j] = (exact > 0) - (exact < 0)
+    return signs
+
+
+def isConvex(edges):
+    """Check whether a polygon is convex.
+
+    Args:
+        edges: The edges of the polygon (see polygonEdges).
+
+    Returns:
+        True if all the turns between consecutive edges are in the same
+        direction (aligned vertices are allowed).
+    """
+    (x1, y1, x2, y2) = edges
+    (dx, dy) = (x2 - x1, y2 - y1)
+    # The next edge of each edge
+    turns = (dx * np.concatenate((dy[1:], dy[:1])) -
+             dy * np.concatenate((dx[1:], dx[:1])))
+    return bool(((turns >= 0).all() and (turns > 0).any()) or
+                ((turns <= 0).all() and (turns < 0).any()))
+
+
+def pointsInConvexPolygon(xs, ys, edges):
+    """Test whether several points are strictly inside a convex polygon.
+
+    Half-plane test: a point is inside if it is strictly on the inner side
+    of every edge. The orientation tests are exact (see pointsInPolygon).
+
+    Args:
+        xs: (N,) array-like of x coordinates.
+        ys: (N,) array-like of y coordinates.
+        edges: The edges of a convex polygon (see polygonEdges).
+
+    Returns:
+        A (N,) bool array, True for the points inside the polygon.
+    """
+    xs = np.asarray(xs, dtype=np.float64).reshape(-1, 1)
+    ys = np.asarray(ys, dtype=np.float64).reshape(-1, 1)
+    (x1, y1, x2, y2) = edges
+    # The inner side is on the left of the edges of a counter clockwise
+    # polygon, on the right of a clockwise one.
+    inner = np.sign(np.sum(x1 * y2 - x2 * y1))
+    signs = _orientations(edges, xs, ys)
+    return np.all(signs == inner, axis=1)
+
+
+def pointsInPolygon(xs, ys, edges):
+    """Test whether several points are strictly inside a polygon.
+
+    Crossing number test over the edges of the polygon: a point is inside
+    if a ray going from it towards +x crosses the edges an odd number of
+    times. The points on the edges are outside. The orientation tests are
+    exact, so the result is the same as the contains predicate of shapely.
+
+    Args:
+        xs: (N,) array-like of x coordinates.
+        ys: (N,) array-like of y coordinates.
+        edges: The edges of the polygon (see polygonEdges).
+
+    Returns:
+        A (N,) bool array, True for the points inside the polygon.
+    """
+    xs = np.asarray(xs, dtype=np.float64).reshape(-1, 1)
+    ys = np.asarray(ys, dtype=np.float64).reshape(-1, 1)
+    (x1, y1, x2, y2) = edges
+    signs = _orientations(edges, xs, ys)
+
+    # The ray crosses the edges straddling the horizontal line of the point
+    # when the point is on the left of the upward edges, or on the right of
+    # the downward ones (N, E).
+    straddle = (y1 > ys) != (y2 > ys)
+    crossing = straddle & (signs == np.sign(y2 - y1))
+    inside = np.count_nonzero(crossing, axis=1) % 2 == 1
+
+    collinear = signs == 0
+    if collinear.any():
+        # Points on an edge: collinear and within the edge
+        within = ((np.minimum(x1, x2) <= xs) & (xs <= np.maximum(x1, x2)) &
+                  (np.minimum(y1, y2) <= ys) & (ys <= np.maximum(y1, y2)))
+        inside &= ~np.any(collinear & within, axis=1)
+    return inside
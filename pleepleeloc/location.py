@@ -1,7 +1,30 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from .compute import compute2Data, compute3Data, sortData
+import logging
+import math
+from collections import OrderedDict
+
+from .compute import (CONSENSUS, GATING, ODOMETRY, PERIMETER, RESECTION,
+                      computeAllPairs, filterPoints, gateDatas,
+                      resectFirstThree, resectLeastSquares, sortData,
+                      stopwatch, triangulate)
+from .garden import Garden
+from .geometry import PointArray
+from .observations import ObservationBatch
+
+logger = logging.getLogger(__name__)
+
+# Solvers available for Location.computePos
+# Use the first two or three datas only.
+TRIANGULATION = 'triangulation'
+# Use all the pairs of datas (see compute.computeAllPairs).
+ALL_PAIRS = 'allpairs'
+# Fit the position to all the bearings (see compute.resectLeastSquares).
+LEAST_SQUARES = 'leastsquares'
+# Closed form from the first three datas (see compute.resectFirstThree).
+# Falls back to TRIANGULATION with two datas or in degenerate cases.
+CLOSED_FORM = 'closedform'
 
 
 class Odometry:
@@ -45,16 +68,137 @@ def filterOdometry(solutions, odometry):
     of the odometry.
 
     Args:
-        solutions: A set of points candidates to the final solution.
-        odometry: Odometry instance.
+        solutions: A set of points candidates to the final solution
+                   (list of Points or PointArray).
+        odometry: Odometry instance, or None to keep all the solutions.
 
     Returns:
-        A list of candidates points filtered.
+        A list of candidates points filtered, or a PointArray if solutions
+        is one.
     """
+    if odometry is None:
+        return solutions
+    if isinstance(solutions, PointArray):
+        distances = solutions.distances(odometry.lastPos)
+        return solutions[distances - odometry.dist < odometry._range]
     soluce = [value for value in solutions if odometry.withinRange(value)]
     return soluce
 
 
+class StageStatistics:
+    """Hook accumulating the statistics of each stage of the computation.
+
+    An instance can be given as the hook of a Location (see
+    compute.Stopwatch).
+
+    Attributes:
+        calls: Dictionary stage -> number of times the stage ran.
+
+        durations: Dictionary stage -> total duration of the stage (second).
+
+        candidates: Dictionary stage -> total number of candidates produced
+                    by the stage.
+    """
+
+    def __init__(self):
+        self.calls = {}
+        self.durations = {}
+        self.candidates = {}
+
+    def __call__(self, stage, duration, count):
+        self.calls[stage] = self.calls.get(stage, 0) + 1
+        self.durations[stage] = self.durations.get(stage, 0.0) + duration
+        self.candidates[stage] = self.candidates.get(stage, 0) + count
+
+    def meanDuration(self, stage):
+        """Mean duration of a stage (second), 0 if it never ran."""
+        if not self.calls.get(stage):
+            return 0.0
+        return self.durations[stage] / self.calls[stage]
+
+
+class ResultCache:
+    """LRU cache of the positions computed by a Location.
+
+    The key of a frame is made of quantized values: the angle of the
+    magnetic captor, the odometry and the (color, angle, distance) of each
+    Data. Frames falling in the same buckets share the same position, so a
+    robot standing still does not recompute the same frame again and again.
+
+    Attributes:
+        size: The maximum number of positions kept.
+
+        angleStep: The size of the angle buckets (degree).
+
+        distanceStep: The size of the distance and position buckets
+                      (meter).
+
+        hits: The number of frames found in the cache.
+
+        misses: The number of frames computed.
+    """
+
+    def __init__(self, size, angleStep=0.1, distanceStep=0.01):
+        self.size = size
+        self.angleStep = angleStep
+        self.distanceStep = distanceStep
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _bucket(self, value, step):
+        return None if value is None else int(round(value / step))
+
+    def key(self, angleToDirection, odometry, datas):
+        """Quantized key of a frame (same arguments as computePos)."""
+        angle = self.angleStep
+        dist = self.distanceStep
+        if odometry is not None:
+            odometry = (self._bucket(odometry.lastPos.X, dist),
+                        self._bucket(odometry.lastPos.Y, dist),
+                        self._bucket(odometry.dist, dist))
+        if isinstance(datas, ObservationBatch):
+            observations = zip(datas.colors.tolist(), datas.angles.tolist(),
+                               [None if math.isnan(value) else value
+                                for value in datas.distances.tolist()])
+        else:
+            observations = ((data.led.color.value, data.angle, data.distance)
+                            for data in datas)
+        return (self._bucket(angleToDirection, angle), odometry,
+                tuple((color, self._bucket(value, angle),
+                       self._bucket(distance, dist))
+                      for (color, value, distance) in observations))
+
+    def get(self, key):
+        """Get the position of a key.
+
+        Returns:
+            A tuple (found, position). position is None if found is False.
+        """
+        if key not in self._entries:
+            self.misses += 1
+            return (False, None)
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return (True, self._entries[key])
+
+    def put(self, key, position):
+        """Store a position, evicting the least recently used one."""
+        self._entries[key] = position
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Remove all the positions and reset the counters."""
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
 class Location:
     """A class encompassing all the datas used to compute the location.
 
@@ -82,25 +226,79 @@ class Location:
         perimeter: List of LEDs. (LED class can be found in compute.py)
                    Each element of the lsit represents a corner of the area.
                    The corners MUST be sorted clockwise when inserted in the list.
+                   A single Garden can be given instead of the LEDs.
 
         angleToDirection: Angle between actual direction and North.
                           This data is to be harvested in real time with a
                           magnetic captor. Data is needed everytime the
                           location is computed.
 
+        garden: The perimeter compiled once as a Garden instance
+                (see garden.py). It is given to the compute functions
+                instead of the raw perimeter.
+
         odometry: Instance of class Odometry.
 
         datas: List of Data. (The Data class can be found in compute.py)
                These values represents the data collected by the robot camera.
                (LEDs percieved, angle, estimated distance)
+
+        solver: The solver used by computePos. TRIANGULATION (default),
+                ALL_PAIRS, LEAST_SQUARES or CLOSED_FORM.
+
+        maxPairs: With the ALL_PAIRS solver, the maximum number of pairs
+                  of datas evaluated per frame. The pairs with the best
+                  geometry are kept (see compute.pairQuality). None for no
+                  limit.
+
+        hook: Called at the end of each stage of computePos as
+              hook(stage, duration, count), see compute.Stopwatch and
+              StageStatistics. None to disable the instrumentation.
+
+        rounding: Round the candidates of the ALL_PAIRS, LEAST_SQUARES and
+                  CLOSED_FORM solvers (see compute.PRECISION). False keeps
+                  the full precision.
+
+        cache: ResultCache of the last positions computed, None if the
+               cacheSize given is 0 (default).
+
+        gating: Use the odometry before solving: the datas inconsistent
+                with the disc predicted by the odometry are rejected and,
+                with the ALL_PAIRS solver, the pairs crossing outside of
+                this disc are skipped (see compute.gateDatas).
+
+        gateTolerance: The noise allowed on the bearings by the gating
+                       (degree).
+
+        rectangle: None to detect whether the perimeter is a rectangle
+                   aligned with the axes (see garden.Garden), True to
+                   require it, False to use the general polygon.
     """
 
-    def __init__(self, angleNorth, dirInit, height, *args):
+    def __init__(self, angleNorth, dirInit, height, *args,
+                 solver=TRIANGULATION, maxPairs=None, hook=None,
+                 rounding=True, cacheSize=0, gating=False,
+                 gateTolerance=5.0, rectangle=None):
         """Initialize a Location"""
+        if solver not in self._solvers:
+            raise ValueError('Unknown solver: %s' % solver)
         self.angleNorth = angleNorth
         self.dirInit = dirInit
         self.heightLEDs = height
-        self.perimeter = args
+        if len(args) == 1 and isinstance(args[0], Garden):
+            # A Garden compiled once can be shared by several Locations
+            self.garden = args[0]
+            self.perimeter = self.garden.leds
+        else:
+            self.perimeter = args
+            self.garden = Garden(self.perimeter, rectangle)
+        self.solver = solver
+        self.maxPairs = maxPairs
+        self.hook = hook
+        self.rounding = rounding
+        self.cache = ResultCache(cacheSize) if cacheSize else None
+        self.gating = gating
+        self.gateTolerance = gateTolerance
         # at each iteration
         self.angleToDirection = None
         self.odometry = None
@@ -110,7 +308,10 @@ class Location:
         """Refresh the Location instance with the datas from captors"""
         self.angleToDirection = angleToDirection
         self.odometry = odometry
-        self.datas = args
+        if len(args) == 1 and isinstance(args[0], ObservationBatch):
+            self.datas = args[0]
+        else:
+            self.datas = args
 
     def computePos(self, *args):
         """Compute the current location of the robot from the datas.
@@ -121,27 +322,99 @@ class Location:
 
             odometry: An instance of Odometry class.
 
-            datas: list of Data instances (see utils.Data).
+            datas: list of Data instances (see utils.Data), or a single
+                   ObservationBatch of the frame (see observations.py).
 
         Returns:
             A single sets of coordiantes representing the current position
-            of the robot.
+            of the robot. None if the datas do not agree on a position.
         """
         self.refreshData(*args)
-        my_args = [self.dirInit, self.angleNorth, self.angleToDirection,
-                   self.perimeter]
-        points = []
-
         if len(self.datas) < 2:
-            print("Not enough data")
+            logger.info("Not enough data")
             return None
-        elif len(self.datas) == 2:
-            points = compute2Data(*self.datas, *my_args)
-        else:
-            points = compute3Data(self.datas[0], self.datas[1],
-                                  self.datas[2], *my_args)
 
+        if self.cache is not None:
+            key = self.cache.key(self.angleToDirection, self.odometry,
+                                 self.datas)
+            (found, position) = self.cache.get(key)
+            if found:
+                return position
+        position = self._computePos()
+        if self.cache is not None:
+            self.cache.put(key, position)
+        return position
+
+    def _computePos(self):
+        """Run the solver and the filters on the datas refreshed."""
+        if self._gate() is not None:
+            watch = stopwatch(self.hook)
+            self.datas = gateDatas(self.datas, self.dirInit, *self._gate(),
+                                   self.gateTolerance)
+            watch.lap(GATING, len(self.datas))
+            if len(self.datas) < 2:
+                logger.info("Not enough data consistent with the odometry")
+                return None
+        points = self._solvers[self.solver](self)
+        watch = stopwatch(self.hook)
         points = filterOdometry(points, self.odometry)
+        watch.lap(ODOMETRY, len(points))
         if len(points) == 0:
-            print("No good datas")
-        return sortData(points)
+            logger.info("No good datas")
+        position = sortData(points)
+        watch.lap(CONSENSUS, 0 if position is None else 1)
+        if position is None and len(points) > 0:
+            logger.info("No consensus between the candidates")
+        return position
+
+    def _gate(self):
+        """Disc (center, radius) predicted by the odometry, None if the
+        gating is disabled."""
+        if not self.gating or self.odometry is None:
+            return None
+        return (self.odometry.lastPos,
+                self.odometry.dist + self.odometry._range)
+
+    def _args(self):
+        """Arguments of the compute functions after the datas."""
+        return [self.dirInit, self.angleNorth, self.angleToDirection,
+                self.garden]
+
+    def _solveTriangulation(self):
+        return triangulate(self.datas, *self._args(), hook=self.hook)
+
+    def _solveAllPairs(self):
+        return computeAllPairs(self.datas, *self._args(),
+                               maxPairs=self.maxPairs, hook=self.hook,
+                               rounding=self.rounding, gate=self._gate())
+
+    def _filterResection(self, point, watch):
+        watch.lap(RESECTION, 0 if point is None else 1)
+        points = [] if point is None else filterPoints([point], self.garden)
+        watch.lap(PERIMETER, len(points))
+        return points
+
+    def _solveLeastSquares(self):
+        watch = stopwatch(self.hook)
+        start = self.odometry.lastPos if self.odometry is not None else None
+        point = resectLeastSquares(self.datas, self.dirInit, start,
+                                   rounding=self.rounding)
+        return self._filterResection(point, watch)
+
+    def _solveClosedForm(self):
+        if len(self.datas) < 3:
+            return self._solveTriangulation()
+        watch = stopwatch(self.hook)
+        (point, degenerate) = resectFirstThree(self.datas, self.dirInit,
+                                               rounding=self.rounding)
+        if degenerate:
+            logger.info("Degenerate bearings")
+            return self._solveTriangulation()
+        return self._filterResection(point, watch)
+
+    _solvers = {
+        TRIANGULATION: _solveTriangulation,
+        ALL_PAIRS: _solveAllPairs,
+        LEAST_SQUARES: _solveLeastSquares,
+        CLOSED_FORM: _solveClosedForm,
+    }
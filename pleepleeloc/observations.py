@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+from .garden import compileGarden
+from .utils import Color, Data
+
+"""
+Columnar representation of the datas sent by the camera.
+
+An ObservationBatch holds the observations of one or many frames in
+contiguous typed arrays (color codes, angles, distances) instead of one Data
+instance per blob. It is built in bulk from the raw output of the camera and
+is consumed directly by the compute functions (triangulate, computeAllPairs,
+gateDatas, resectLeastSquares, resectFirstThree) and by Location.computePos,
+without building Data instances.
+"""
+
+
+class ObservationBatch:
+    """Observations of the camera stored as arrays.
+
+    The observations of frame i are at the indices offsets[i] to
+    offsets[i + 1]. The arrays of the LEDs are looked up once from the
+    garden with the color codes.
+
+    Attributes:
+        garden: The Garden of the observations.
+
+        colors: (N,) int8 array of the values of the Colors.
+
+        angles: (N,) array of the angles (degree). Same convention as
+                Data.angle: the angle of the camera plus the angle of the
+                magnetic captor and the angle to the North.
+
+        distances: (N,) array of the distances computed by the image
+                   treatment, NaN when unknown.
+
+        offsets: (F + 1,) array of the first observation of each frame.
+
+        angleToDirection: (F,) array of the angles of the magnetic captor
+                          of each frame.
+
+        centers: (N, 2) array of the coordinates of the LEDs observed.
+
+        heights: (N,) array of the heights of the LEDs observed.
+    """
+
+    def __init__(self, garden, colors, angles, distances, offsets,
+                 angleToDirection):
+        colors = np.asarray(colors)
+        if len(colors) and (colors.min() < 0 or colors.max() >= len(Color)):
+            raise ValueError('Color not found')
+        self.garden = garden
+        self.colors = colors.astype(np.int8, copy=False)
+        self.angles = angles
+        self.distances = distances
+        self.offsets = offsets
+        self.angleToDirection = angleToDirection
+        self.centers = garden.ledCoords[colors]
+        self.heights = garden.ledHeights[colors]
+        if np.isnan(self.heights).any():
+            raise ValueError('Color not found')
+
+    @classmethod
+    def fromArrays(cls, colors, angles, angleNorth, angleToDirection,
+                   perimeter, distances=None, offsets=None):
+        """Build a batch from the arrays of the camera.
+
+        Args:
+            colors: (N,) array-like of the values of the Colors.
+
+            angles: (N,) array-like of the angles of the camera (degree).
+
+            angleNorth: The angle to the North at initialisation.
+
+            angleToDirection: The angle of the magnetic captor, a single
+                              value or one per frame.
+
+            perimeter: A Garden or a list of LEDs.
+
+            distances: (N,) array-like of distances, NaN when unknown. None
+                       if no distance is known.
+
+            offsets: (F + 1,) array-like of the first observation of each
+                     frame. None for a single frame.
+
+        Returns:
+            An ObservationBatch instance.
+
+        Raises:
+            ValueError: A color does not correspond to an existing LED.
+        """
+        garden = compileGarden(perimeter)
+        colors = np.asarray(colors, dtype=np.int64)
+        if offsets is None:
+            offsets = [0, len(colors)]
+        offsets = np.asarray(offsets, dtype=np.int64)
+        angleToDirection = np.broadcast_to(
+            np.asarray(angleToDirection, dtype=np.float64),
+            (len(offsets) - 1,)).copy()
+        counts = np.diff(offsets)
+        angles = (np.asarray(angles, dtype=np.float64) +
+                  np.repeat(angleToDirection, counts) + angleNorth)
+        if distances is None:
+            distances = np.full(len(colors), np.nan)
+        distances = np.asarray(distances, dtype=np.float64)
+        return cls(garden, colors, angles, distances, offsets,
+                   angleToDirection)
+
+    @classmethod
+    def fromBearings(cls, frames, angleNorth, angleToDirection, perimeter):
+        """Build a batch from the bearings of several frames.
+
+        Args:
+            frames: List of frames, each one a list of tuples (color, angle)
+                    or (color, angle, distance). The color is a Color or
+                    its value.
+
+            angleNorth: The angle to the North at initialisation.
+
+            angleToDirection: The angle of the magnetic captor, a single
+                              value or one per frame.
+
+            perimeter: A Garden or a list of LEDs.
+
+        Returns:
+            An ObservationBatch instance.
+        """
+        bearings = [bearing for frame in frames for bearing in frame]
+        offsets = np.concatenate(([0], np.cumsum([len(frame)
+                                                  for frame in frames])))
+        colors = [Color(bearing[0]).value for bearing in bearings]
+        angles = [bearing[1] for bearing in bearings]
+        distances = [bearing[2] if len(bearing) > 2 and bearing[2] is not None
+                     else np.nan for bearing in bearings]
+        return cls.fromArrays(colors, angles, angleNorth, angleToDirection,
+                              perimeter, distances, offsets)
+
+    def __len__(self):
+        """The number of observations."""
+        return len(self.colors)
+
+    @property
+    def frames(self):
+        """The number of frames."""
+        return len(self.offsets) - 1
+
+    def frame(self, index):
+        """Get the observations of a frame as a batch (views of the arrays).
+
+        Args:
+            index: The index of the frame.
+
+        Returns:
+            An ObservationBatch of a single frame.
+        """
+        start = self.offsets[index]
+        end = self.offsets[index + 1]
+        return self.select(slice(start, end),
+                           self.angleToDirection[index:index + 1])
+
+    def select(self, index, angleToDirection=None):
+        """Get some observations of a single frame batch.
+
+        Args:
+            index: An index array, a bool mask or a slice of observations.
+
+            angleToDirection: Angle of the magnetic captor of the frame, the
+                              one of the batch if None.
+
+        Returns:
+            An ObservationBatch of a single frame.
+        """
+        batch = object.__new__(ObservationBatch)
+        batch.garden = self.garden
+        batch.colors = self.colors[index]
+        batch.angles = self.angles[index]
+        batch.distances = self.distances[index]
+        batch.centers = self.centers[index]
+        batch.heights = self.heights[index]
+        batch.offsets = np.array([0, len(batch.colors)], dtype=np.int64)
+        batch.angleToDirection = (self.angleToDirection[:1]
+                                  if angleToDirection is None
+                                  else angleToDirection)
+        return batch
+
+    def toDatas(self):
+        """Build the Data instances of a single frame batch.
+
+        Returns:
+            A list of Data instances, for the functions needing them.
+        """
+        return [Data(Color(int(color)), float(angle), 0.0, 0.0, self.garden,
+                     None if np.isnan(distance) else float(distance))
+                for (color, angle, distance) in zip(self.colors, self.angles,
+                                                    self.distances)]
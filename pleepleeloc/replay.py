@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby
+
+from .geometry import Point
+from .location import (ALL_PAIRS, CLOSED_FORM, LEAST_SQUARES, TRIANGULATION,
+                       Location, Odometry)
+from .observations import ObservationBatch
+from .utils import LED, Color
+
+"""
+Offline replay of logged runs.
+
+The logs of the bearings, of the magnetic captor and of the odometry are
+streamed frame by frame and the frames are grouped by run. Each run is
+computed in a worker process, which builds the Location once, so all the
+cores are used when many runs are replayed. The trajectories are written as
+CSV (run, frame, x, y) in the order of the runs.
+
+Two log formats are read:
+    - JSON lines, one frame per line, as written by
+      simulation.SimulatedRun.writeJSONL:
+      {"run": ..., "frame": ..., "angleToDirection": ...,
+       "odometry": [lastX, lastY, dist],
+       "bearings": [[color name, angle], ...]}
+    - CSV with a header, one bearing per row:
+      run,frame,angleToDirection,lastX,lastY,dist,color,angle[,distance]
+The bearings of a frame can be in any order, they are sorted from left to
+right as seen by the camera (decreasing angles) before the computation.
+
+The map and the datas of initialisation are given as a JSON configuration:
+    {"angleNorth": ..., "dirInit": [x, y], "height": ...,
+     "perimeter": [[color name, x, y(, height)], ...]}
+
+    $ pleeplee-replay --config garden.json --output trajectories.csv \\
+          day1.jsonl day2.csv
+"""
+
+# Location of a worker process (see _initWorker).
+_worker = {}
+
+
+def _color(name):
+    """Color value of a color name or value."""
+    if isinstance(name, str) and not name.isdigit():
+        return Color[name.upper()].value
+    return Color(int(name)).value
+
+
+def readConfig(path):
+    """Read the JSON configuration of the map.
+
+    Args:
+        path: The path of the configuration.
+
+    Returns:
+        A tuple (angleNorth, dirInit, height, perimeter), perimeter being the
+        list of the LEDs sorted clockwise.
+    """
+    with open(path) as config:
+        config = json.load(config)
+    perimeter = [LED(Color(_color(led[0])),
+                     Point(float(led[1]), float(led[2])),
+                     height=float(led[3]) if len(led) > 3 else 0.0)
+                 for led in config['perimeter']]
+    return (float(config['angleNorth']), tuple(config['dirInit']),
+            float(config.get('height', 0.0)), perimeter)
+
+
+def _readJSONL(log):
+    for line in log:
+        if not line.strip():
+            continue
+        frame = json.loads(line)
+        yield (str(frame['run']), int(frame['frame']),
+               float(frame['angleToDirection']),
+               tuple(float(value) for value in frame['odometry']),
+               [(_color(bearing[0]),) + tuple(bearing[1:])
+                for bearing in frame['bearings']])
+
+
+def _readCSV(log):
+    rows = csv.DictReader(log)
+    for ((run, index), bearings) in groupby(
+            rows, key=lambda row: (row['run'], row['frame'])):
+        bearings = list(bearings)
+        first = bearings[0]
+        yield (run, int(index), float(first['angleToDirection']),
+               (float(first['lastX']), float(first['lastY']),
+                float(first['dist'])),
+               [(_color(row['color']), float(row['angle'])) +
+                ((float(row['distance']),) if row.get('distance') else ())
+                for row in bearings])
+
+
+def readFrames(path):
+    """Stream the frames of a log.
+
+    Args:
+        path: The path of a JSON lines (.jsonl, .json) or CSV (.csv) log.
+
+    Returns:
+        An iterator of tuples (run, frame, angleToDirection,
+        (lastX, lastY, dist), bearings). The bearings are tuples
+        (color value, angle[, distance]).
+    """
+    reader = _readCSV if path.endswith('.csv') else _readJSONL
+    with open(path, newline='') as log:
+        yield from reader(log)
+
+
+def readRuns(paths):
+    """Stream the runs of several logs.
+
+    The frames of a run must be contiguous in a log.
+
+    Returns:
+        An iterator of tuples (run, frames).
+    """
+    for path in paths:
+        for (run, frames) in groupby(readFrames(path),
+                                     key=lambda frame: frame[0]):
+            yield (run, list(frames))
+
+
+def _initWorker(angleNorth, dirInit, height, perimeter, options):
+    """Build the Location once in a worker process."""
+    _worker['location'] = Location(angleNorth, dirInit, height, *perimeter,
+                                   **options)
+
+
+def replayRun(location, frames):
+    """Compute the positions of the frames of a run.
+
+    Args:
+        location: A Location instance.
+        frames: The frames of the run (see readFrames).
+
+    Returns:
+        A list of tuples (frame, x, y), x and y are None when there is no
+        position.
+    """
+    # The logs keep the bearings in any order, the TRIANGULATION solver
+    # needs them from left to right as seen by the camera.
+    bearings = [sorted(frame[4], key=lambda bearing: -bearing[1])
+                for frame in frames]
+    batch = ObservationBatch.fromBearings(
+        bearings, location.angleNorth, [frame[2] for frame in frames],
+        location.garden)
+    trajectory = []
+    for (i, (_, index, angleToDirection, odometry, _)) in enumerate(frames):
+        odometry = Odometry(Point(odometry[0], odometry[1]), odometry[2])
+        position = location.computePos(angleToDirection, odometry,
+                                       batch.frame(i))
+        if position is None:
+            trajectory.append((index, None, None))
+        else:
+            trajectory.append((index, position.X, position.Y))
+    return trajectory
+
+
+def _replayRemote(frames):
+    return replayRun(_worker['location'], frames)
+
+
+def replay(paths, output, config, options, workers=None):
+    """Replay logs in parallel and write the trajectories.
+
+    Args:
+        paths: The paths of the logs.
+
+        output: A text file where the trajectories are written as CSV.
+
+        config: The tuple (angleNorth, dirInit, height, perimeter) of the
+                map (see readConfig).
+
+        options: Dictionary of keyword arguments of the Location.
+
+        workers: The number of worker processes, None for one per core.
+
+    Returns:
+        A tuple (runs, frames) of the numbers of runs and frames replayed.
+    """
+    workers = workers or os.cpu_count()
+    writer = csv.writer(output)
+    writer.writerow(('run', 'frame', 'x', 'y'))
+    (runs, count) = (0, 0)
+    pending = []
+
+    def write(run, future):
+        for (index, x, y) in future.result():
+            writer.writerow((run, index, '' if x is None else x,
+                             '' if y is None else y))
+
+    with ProcessPoolExecutor(workers, initializer=_initWorker,
+                             initargs=config + (options,)) as executor:
+        for (run, frames) in readRuns(paths):
+            pending.append((run, executor.submit(_replayRemote, frames)))
+            runs += 1
+            count += len(frames)
+            # Bound the memory used by the runs waiting for a worker
+            while len(pending) > 2 * workers:
+                write(*pending.pop(0))
+        for (run, future) in pending:
+            write(run, future)
+    return (runs, count)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Replay logged runs with the location and write the '
+        'trajectories.')
+    parser.add_argument('logs', nargs='+',
+                        help='JSON lines (.jsonl) or CSV (.csv) logs')
+    parser.add_argument('--config', required=True,
+                        help='JSON configuration of the map')
+    parser.add_argument('--output', default='-',
+                        help='CSV file of the trajectories (default: stdout)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of worker processes (default: one per '
+                        'core)')
+    parser.add_argument('--solver', default=TRIANGULATION,
+                        choices=(TRIANGULATION, ALL_PAIRS, LEAST_SQUARES,
+                                 CLOSED_FORM))
+    parser.add_argument('--max-pairs', type=int, default=None)
+    parser.add_argument('--gating', action='store_true',
+                        help='gate the datas with the odometry')
+    parser.add_argument('--no-rounding', action='store_true',
+                        help='keep the full precision of the positions')
+    options = parser.parse_args(argv)
+
+    config = readConfig(options.config)
+    locationOptions = {'solver': options.solver,
+                       'maxPairs': options.max_pairs,
+                       'gating': options.gating,
+                       'rounding': not options.no_rounding}
+    start = time.perf_counter()
+    if options.output == '-':
+        (runs, frames) = replay(options.logs, sys.stdout, config,
+                                locationOptions, options.workers)
+    else:
+        with open(options.output, 'w', newline='') as output:
+            (runs, frames) = replay(options.logs, output, config,
+                                    locationOptions, options.workers)
+    elapsed = time.perf_counter() - start
+    print('Replayed %d frames of %d runs in %.2fs (%.0f frames/s)'
+          % (frames, runs, elapsed, frames / elapsed if elapsed else 0.0),
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
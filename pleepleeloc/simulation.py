@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import math
+
+import numpy as np
+
+from .garden import compileGarden
+from .geometry import Point
+from .location import Odometry
+from .utils import LED, Color, Data
+
+"""
+Simulation of the captors of the robot, to generate realistic inputs for the
+location without a robot.
+
+Given a perimeter, a ground truth trajectory and noise models, the simulator
+generates the datas of every frame in a few vectorized operations. The
+frames can then be replayed as Data and Odometry instances, saved to disk or
+written as a JSON lines log.
+
+The heading of the robot is the angle between the x axis of the map and the
+axis of the robot, counter clockwise, in degree (see tracking.py).
+"""
+
+
+def _wrapDegrees(angles):
+    """Wrap angles in degree to [-180, 180)."""
+    return (angles + 180.0) % 360.0 - 180.0
+
+
+def regularGarden(size, radius=5.0, center=(6.0, 6.0)):
+    """Build a garden shaped as a regular polygon.
+
+    Args:
+        size: The number of LEDs (at most 7).
+        radius: The distance from the center to the LEDs (meter).
+        center: The center of the garden (x y).
+
+    Returns:
+        A list of LEDs sorted clockwise.
+    """
+    colors = [color for color in Color if color != Color.NONE][:size]
+    leds = []
+    for (i, color) in enumerate(colors):
+        # Clockwise on the map, whose y axis goes down (see compute.py)
+        theta = 2 * math.pi * i / size
+        leds.append(LED(color, Point(center[0] + radius * math.cos(theta),
+                                     center[1] + radius * math.sin(theta))))
+    return leds
+
+
+def waypointsTrajectory(waypoints, step):
+    """Trajectory of a robot going in straight lines between waypoints.
+
+    The robot moves in a straight line and turns in place, so the heading
+    is the one of the current segment.
+
+    Args:
+        waypoints: List of (x y) positions.
+        step: The distance traveled between two frames (meter).
+
+    Returns:
+        A tuple of arrays (xs, ys, headings).
+    """
+    waypoints = np.asarray(waypoints, dtype=np.float64)
+    segments = np.diff(waypoints, axis=0)
+    lengths = np.hypot(segments[:, 0], segments[:, 1])
+    cumulative = np.concatenate(([0.0], np.cumsum(lengths)))
+    distances = np.arange(0.0, cumulative[-1] + step / 2, step)
+    xs = np.interp(distances, cumulative, waypoints[:, 0])
+    ys = np.interp(distances, cumulative, waypoints[:, 1])
+    index = np.clip(np.searchsorted(cumulative, distances, side='right') - 1,
+                    0, len(segments) - 1)
+    headings = np.degrees(np.arctan2(segments[:, 1], segments[:, 0]))[index]
+    return (xs, ys, headings)
+
+
+class SimulatedRun:
+    """Frames generated by a Simulator.
+
+    Attributes:
+        garden: The Garden of the run.
+
+        dirInit, angleNorth: The datas of initialisation of the robot.
+
+        positions: (F, 2) array of the ground truth positions.
+
+        headings: (F,) array of the ground truth headings (degree).
+
+        angleToDirection: (F,) array of the angles of the magnetic captor.
+
+        colors: (L,) array of the Color values of the LEDs.
+
+        bearings: (F, L) array of the camera angles of each LED (degree).
+
+        lastPos: (F, 2) array of the last positions given to the odometry.
+
+        dists: (F,) array of the distances traveled given by the odometry.
+    """
+
+    def __init__(self, garden, dirInit, angleNorth, positions, headings,
+                 angleToDirection, colors, bearings, lastPos, dists):
+        self.garden = garden
+        self.dirInit = dirInit
+        self.angleNorth = angleNorth
+        self.positions = positions
+        self.headings = headings
+        self.angleToDirection = angleToDirection
+        self.colors = colors
+        self.bearings = bearings
+        self.lastPos = lastPos
+        self.dists = dists
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.frame(i)
+
+    def frame(self, index):
+        """Get the inputs of Location.computePos for a frame.
+
+        Args:
+            index: The index of the frame.
+
+        Returns:
+            A tuple (angleToDirection, odometry, datas). The datas are
+            sorted from left to right as seen by the camera.
+        """
+        angleToDirection = float(self.angleToDirection[index])
+        odometry = Odometry(Point(*self.lastPos[index].tolist()),
+                            float(self.dists[index]))
+        angles = self.bearings[index]
+        datas = [Data(Color(int(self.colors[i])), float(angles[i]),
+                      self.angleNorth, angleToDirection, self.garden)
+                 for i in np.argsort(-angles, kind='stable')]
+        return (angleToDirection, odometry, datas)
+
+    def save(self, path):
+        """Save the frames in a compressed NumPy file (.npz).
+
+        The garden is not saved, it has to be given again to **load**.
+        """
+        np.savez_compressed(path, dirInit=np.asarray(self.dirInit),
+                            angleNorth=self.angleNorth,
+                            positions=self.positions, headings=self.headings,
+                            angleToDirection=self.angleToDirection,
+                            colors=self.colors, bearings=self.bearings,
+                            lastPos=self.lastPos, dists=self.dists)
+
+    @classmethod
+    def load(cls, path, perimeter):
+        """Load frames saved with **save**.
+
+        Args:
+            path: The path of the .npz file.
+            perimeter: The perimeter of the run (Garden or list of LEDs).
+
+        Returns:
+            A SimulatedRun instance.
+        """
+        with np.load(path) as saved:
+            return cls(compileGarden(perimeter),
+                       tuple(saved['dirInit'].tolist()),
+                       float(saved['angleNorth']), saved['positions'],
+                       saved['headings'], saved['angleToDirection'],
+                       saved['colors'], saved['bearings'], saved['lastPos'],
+                       saved['dists'])
+
+    def writeJSONL(self, path, run='simulation'):
+        """Write the frames as a JSON lines log, one frame per line.
+
+        Each line contains the run name, the index of the frame, the angle
+        of the magnetic captor, the odometry [lastX, lastY, dist] and the
+        bearings [[color name, camera angle], ...].
+        """
+        names = [Color(int(value)).name for value in self.colors]
+        with open(path, 'w') as log:
+            for index in range(len(self)):
+                frame = {
+                    'run': run,
+                    'frame': index,
+                    'angleToDirection': float(self.angleToDirection[index]),
+                    'odometry': self.lastPos[index].tolist() +
+                    [float(self.dists[index])],
+                    'bearings': [[name, float(angle)] for (name, angle)
+                                 in zip(names, self.bearings[index])],
+                }
+                log.write(json.dumps(frame) + '\n')
+
+
+class Simulator:
+    """Generate the datas of the captors along a trajectory.
+
+    Attributes:
+        garden: The Garden (see garden.py).
+
+        dirInit, angleNorth: The datas of initialisation of the robot
+                             (see location.Location).
+
+        bearingNoise: Standard deviation of the camera angles (degree).
+
+        headingNoise: Standard deviation of the magnetic captor (degree).
+
+        odometryNoise: Standard deviation of the odometry per meter
+                       traveled (meter).
+    """
+
+    def __init__(self, perimeter, dirInit, angleNorth, bearingNoise=0.0,
+                 headingNoise=0.0, odometryNoise=0.0, seed=None):
+        self.garden = compileGarden(perimeter)
+        self.dirInit = dirInit
+        self.angleNorth = angleNorth
+        self.bearingNoise = bearingNoise
+        self.headingNoise = headingNoise
+        self.odometryNoise = odometryNoise
+        self.random = np.random.default_rng(seed)
+
+    def run(self, xs, ys, headings):
+        """Generate the frames of a trajectory.
+
+        The odometry of each frame is given from the previous ground truth
+        position (the first frame starts from its own position).
+
+        Args:
+            xs, ys: Array-like of the ground truth positions.
+            headings: Array-like of the ground truth headings (degree).
+
+        Returns:
+            A SimulatedRun instance.
+        """
+        positions = np.stack((np.asarray(xs, dtype=np.float64),
+                              np.asarray(ys, dtype=np.float64)), axis=1)
+        headings = np.asarray(headings, dtype=np.float64)
+        count = len(positions)
+        leds = np.array([(led.point.X, led.point.Y) for led in self.garden])
+        colors = np.array([led.color.value for led in self.garden],
+                          dtype=np.int8)
+
+        (x, y) = self.dirInit
+        angleToDirection = _wrapDegrees(
+            math.degrees(math.atan2(y, x)) - headings - self.angleNorth +
+            self.random.normal(0.0, self.headingNoise, count))
+
+        delta = leds[None, :, :] - positions[:, None, :]
+        bearings = _wrapDegrees(
+            headings[:, None] -
+            np.degrees(np.arctan2(delta[:, :, 1], delta[:, :, 0])) +
+            self.random.normal(0.0, self.bearingNoise, (count, len(leds))))
+
+        lastPos = np.concatenate((positions[:1], positions[:-1]))
+        steps = positions - lastPos
+        dists = np.hypot(steps[:, 0], steps[:, 1])
+        dists = np.abs(dists + self.random.normal(0.0, 1.0, count) *
+                       self.odometryNoise * dists)
+
+        return SimulatedRun(self.garden, self.dirInit, self.angleNorth,
+                            positions, headings, angleToDirection, colors,
+                            bearings, lastPos, dists)
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+
+from .utils import datasFromBearings
+
+"""
+Asynchronous front end of the Location.
+
+The captors of the robot produce their datas at different rates: the camera
+sweeps, the magnetic captor and the odometry encoders are read by separate
+async iterators. A PositionStream consumes them concurrently and yields the
+positions as an async stream.
+
+The stream only keeps the latest value of each captor (latest wins): a
+camera frame received while the previous one is being computed replaces the
+pending frame instead of queuing, so the positions never lag behind the
+captors.
+"""
+
+# Marks the end of a source in a LatestValue.
+_END = object()
+
+
+class LatestValue:
+    """Slot holding the latest value of a source.
+
+    Attributes:
+        value: The latest value, None before the first one.
+
+        dropped: The number of values replaced before they were read.
+    """
+
+    def __init__(self):
+        self.value = None
+        self.dropped = 0
+        self._pending = _END
+        self._event = asyncio.Event()
+        self._closed = False
+
+    def put(self, value):
+        """Store a new value, replacing the pending one."""
+        if self._pending is not _END:
+            self.dropped += 1
+        self.value = value
+        self._pending = value
+        self._event.set()
+
+    def close(self):
+        """Mark the end of the source."""
+        self._closed = True
+        self._event.set()
+
+    async def get(self):
+        """Wait for a value that has not been read yet.
+
+        Returns:
+            The pending value, or _END if the source is closed.
+        """
+        while self._pending is _END:
+            if self._closed:
+                return _END
+            await self._event.wait()
+            self._event.clear()
+        value = self._pending
+        self._pending = _END
+        return value
+
+
+async def _consume(source, slot):
+    """Copy the values of an async iterator to a slot."""
+    try:
+        async for value in source:
+            slot.put(value)
+    finally:
+        slot.close()
+
+
+class PositionStream:
+    """Async stream of the positions computed from async captors.
+
+    A position is computed for each camera frame read, with the latest
+    angle of the magnetic captor and the latest odometry. The computation
+    runs in an executor so that the captors keep being read meanwhile.
+    The stream ends with the camera source.
+
+    Attributes:
+        location: The Location instance of the robot.
+
+        bearings: Async iterable of camera frames. A frame is a sequence of
+                  tuples (color, angle) or (color, angle, distance) sorted
+                  from left to right.
+
+        headings: Async iterable of the angles of the magnetic captor
+                  (angleToDirection).
+
+        odometries: Async iterable of Odometry instances.
+
+        executor: The concurrent.futures executor computing the positions,
+                  None for the default executor of the event loop.
+
+        frames: The number of camera frames computed.
+
+        dropped: The number of camera frames dropped, because a newer one
+                 arrived before they were computed or because the other
+                 captors had no value yet.
+    """
+
+    def __init__(self, location, bearings, headings, odometries,
+                 executor=None):
+        self.location = location
+        self.bearings = bearings
+        self.headings = headings
+        self.odometries = odometries
+        self.executor = executor
+        self.frames = 0
+        self.dropped = 0
+
+    def __aiter__(self):
+        return self._positions()
+
+    def _compute(self, angleToDirection, odometry, frame):
+        datas = datasFromBearings(frame, self.location.angleNorth,
+                                  angleToDirection, self.location.garden)
+        return self.location.computePos(angleToDirection, odometry, *datas)
+
+    async def _positions(self):
+        loop = asyncio.get_running_loop()
+        camera = LatestValue()
+        heading = LatestValue()
+        odometry = LatestValue()
+        tasks = [asyncio.ensure_future(_consume(source, slot))
+                 for (source, slot) in ((self.bearings, camera),
+                                        (self.headings, heading),
+                                        (self.odometries, odometry))]
+        skipped = 0
+        try:
+            while True:
+                frame = await camera.get()
+                self.dropped = camera.dropped + skipped
+                if frame is _END:
+                    break
+                if heading.value is None or odometry.value is None:
+                    # Cannot be computed before the other captors
+                    skipped += 1
+                    self.dropped += 1
+                    continue
+                position = await loop.run_in_executor(
+                    self.executor, self._compute, heading.value,
+                    odometry.value, frame)
+                self.frames += 1
+                yield position
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import math
+
+import numpy as np
+
+from .geometry import Point
+
+"""
+Incremental localizers built around a Location.
+
+Instead of solving every frame from scratch, the trackers keep an estimate
+of the state of the robot (position and heading) which is predicted with the
+odometry and corrected with the magnetic captor and each bearing.
+
+The heading is the angle between the x axis of the map and the axis of the
+robot, counter clockwise. It is linked to the datas of the Location by:
+    heading = angle(dirInit) - (angleToDirection + angleNorth)
+and the camera sees a LED with the angle:
+    camera angle = heading - angle(LED - position)
+"""
+
+
+def _wrap(angle):
+    """Wrap an angle in radians to [-pi, pi)."""
+    return (angle + math.pi) % (2 * math.pi) - math.pi
+
+
+def headingFromNorth(location, angleToDirection):
+    """Convert the angle of the magnetic captor to a heading.
+
+    Args:
+        location: A Location instance.
+        angleToDirection: The angle between the axis of the robot and the
+                          North (degree).
+
+    Returns:
+        The heading in radian.
+    """
+    (x, y) = location.dirInit
+    return _wrap(math.atan2(y, x) -
+                 math.radians(angleToDirection + location.angleNorth))
+
+
+def _cameraAngle(location, data, angleToDirection):
+    """Angle of a Data relative to the axis of the robot (radian)."""
+    return math.radians(data.angle - angleToDirection - location.angleNorth)
+
+
+class KalmanTracker:
+    """Extended Kalman filter localizer.
+
+    The state (x, y, heading) is predicted with the distance traveled given
+    by the odometry and corrected with the heading of the magnetic captor
+    and the bearing of each Data. Each correction is a scalar update, so
+    the cost is constant per measurement and the position is available
+    after every prediction.
+
+    Attributes:
+        location: The Location instance of the robot. It provides the map,
+                  the datas of initialisation and the first position.
+
+        bearingNoise: Standard deviation of the camera angles (degree).
+
+        headingNoise: Standard deviation of the magnetic captor (degree).
+
+        odometryNoise: Standard deviation of the odometry per meter
+                       traveled (meter).
+
+        turnNoise: Standard deviation of the change of heading between two
+                   predictions (degree).
+
+        gate: Bearings whose innovation is greater than gate standard
+              deviations are rejected as outliers. A heading of the
+              magnetic captor outside of the gate is taken as a turn: the
+              heading is reset to it and the bearings of the frame are not
+              gated.
+
+        state: numpy array (x, y, heading) or None before initialisation.
+
+        covariance: 3x3 covariance of the state.
+    """
+
+    def __init__(self, location, bearingNoise=2.0, headingNoise=5.0,
+                 odometryNoise=0.05, turnNoise=2.0, gate=3.0):
+        self.location = location
+        self.bearingNoise = math.radians(bearingNoise)
+        self.headingNoise = math.radians(headingNoise)
+        self.odometryNoise = odometryNoise
+        self.turnNoise = math.radians(turnNoise)
+        self.gate = gate
+        self.state = None
+        self.covariance = None
+
+    @property
+    def position(self):
+        """The current estimate of the position (Point), None if unknown."""
+        if self.state is None:
+            return None
+        return Point(float(self.state[0]), float(self.state[1]))
+
+    @property
+    def heading(self):
+        """The current estimate of the heading (degree), None if unknown."""
+        if self.state is None:
+            return None
+        return math.degrees(self.state[2])
+
+    def reset(self, position, heading, variance=1.0):
+        """Start the tracking from a known position.
+
+        Args:
+            position: A Point.
+            heading: The heading in radian.
+            variance: The variance of the position (square meter).
+        """
+        self.state = np.array((position.X, position.Y, heading),
+                              dtype=np.float64)
+        self.covariance = np.diag((variance, variance, self.headingNoise**2))
+
+    def predict(self, dist):
+        """Move the estimate forward along the heading.
+
+        Args:
+            dist: The distance traveled since the last prediction (meter).
+        """
+        (x, y, heading) = self.state
+        cos = math.cos(heading)
+        sin = math.sin(heading)
+        self.state = np.array((x + dist * cos, y + dist * sin, heading))
+        jacobian = np.array(((1.0, 0.0, -dist * sin),
+                             (0.0, 1.0, dist * cos),
+                             (0.0, 0.0, 1.0)))
+        noise = (self.odometryNoise * abs(dist))**2
+        self.covariance = (jacobian @ self.covariance @ jacobian.T +
+                           np.diag((noise, noise, self.turnNoise**2)))
+
+    def _correct(self, innovation, jacobian, variance, gate=None):
+        """Scalar Kalman update. Returns False if the update is gated out."""
+        gain = self.covariance @ jacobian
+        innovationVariance = float(jacobian @ gain) + variance
+        if gate is not None and innovation**2 > gate**2 * innovationVariance:
+            return False
+        gain = gain / innovationVariance
+        self.state = self.state + gain * innovation
+        self.state[2] = _wrap(self.state[2])
+        self.covariance = self.covariance - np.outer(gain, jacobian @
+                                                     self.covariance)
+        return True
+
+    def correctHeading(self, angleToDirection):
+        """Correct the estimate with the angle of the magnetic captor.
+
+        Returns:
+            False if the heading is outside of the gate: the robot turned
+            more than predicted, the variance of the heading is increased
+            so the heading follows the magnetic captor.
+        """
+        innovation = _wrap(headingFromNorth(self.location, angleToDirection) -
+                           self.state[2])
+        jacobian = np.array((0.0, 0.0, 1.0))
+        inside = self._correct(innovation, jacobian, self.headingNoise**2,
+                               self.gate)
+        if not inside:
+            self.covariance[2, 2] += innovation**2
+            self._correct(innovation, jacobian, self.headingNoise**2)
+        return inside
+
+    def correctBearing(self, data, angleToDirection, gating=True):
+        """Correct the estimate with a single Data.
+
+        Args:
+            data: A Data instance.
+            angleToDirection: The angle of the magnetic captor used to build
+                              the Data.
+            gating: Reject the bearing if it is an outlier (see gate).
+
+        Returns:
+            True if the bearing was used, False if it was rejected.
+        """
+        cameraAngle = _cameraAngle(self.location, data, angleToDirection)
+        dx = data.led.point.X - self.state[0]
+        dy = data.led.point.Y - self.state[1]
+        rho2 = dx**2 + dy**2
+        if rho2 == 0.0:
+            return False
+        predicted = self.state[2] - math.atan2(dy, dx)
+        jacobian = np.array((-dy / rho2, dx / rho2, 1.0))
+        return self._correct(_wrap(cameraAngle - predicted), jacobian,
+                             self.bearingNoise**2,
+                             self.gate if gating else None)
+
+    def computePos(self, angleToDirection, odometry, *datas):
+        """Update the estimate with the datas of a frame.
+
+        Same arguments as Location.computePos. The distance of the odometry
+        is the distance traveled since the previous call, the prediction is
+        skipped if odometry is None. The first call initialises the tracker
+        with Location.computePos, or with the last position of the odometry
+        if it fails.
+
+        Returns:
+            The current estimate of the position (Point), None if the
+            tracker could not be initialised.
+        """
+        if self.state is None:
+            heading = headingFromNorth(self.location, angleToDirection)
+            position = self.location.computePos(angleToDirection, odometry,
+                                                *datas)
+            if position is not None:
+                self.reset(position, heading, Point._threshold**2)
+                return self.position
+            if odometry is None:
+                return None
+            self.reset(odometry.lastPos, heading, odometry._range**2)
+        elif odometry is not None:
+            self.predict(odometry.dist)
+        turned = not self.correctHeading(angleToDirection)
+        for data in datas:
+            # After a turn the heading is not known well enough to gate
+            self.correctBearing(data, angleToDirection, not turned)
+        return self.position
+
+
+class ParticleFilter:
+    """Vectorized particle filter localizer.
+
+    The particles are stored as NumPy arrays (x, y, heading, weight). They
+    are moved with the odometry, weighted with the heading of the magnetic
+    captor and the bearing of each Data against the LEDs of the map, and
+    resampled with a systematic resampling. Several hypotheses can be kept
+    alive until the datas discriminate them, instead of averaging mirror
+    solutions.
+
+    Attributes:
+        location: The Location instance of the robot. It provides the map
+                  and the datas of initialisation.
+
+        count: The number of particles.
+
+        bearingNoise: Standard deviation of the camera angles (degree).
+
+        headingNoise: Standard deviation of the magnetic captor (degree).
+
+        odometryNoise: Standard deviation of the odometry per meter
+                       traveled (meter).
+
+        turnNoise: Standard deviation of the change of heading between two
+                   predictions (degree).
+
+        xs, ys, headings, weights: The particles, None before
+                                   initialisation.
+    """
+
+    def __init__(self, location, count=2000, bearingNoise=3.0,
+                 headingNoise=5.0, odometryNoise=0.05, turnNoise=2.0,
+                 seed=None):
+        self.location = location
+        self.count = count
+        self.bearingNoise = math.radians(bearingNoise)
+        self.headingNoise = math.radians(headingNoise)
+        self.odometryNoise = odometryNoise
+        self.turnNoise = math.radians(turnNoise)
+        self.random = np.random.default_rng(seed)
+        self.xs = None
+        self.ys = None
+        self.headings = None
+        self.weights = None
+
+    @property
+    def position(self):
+        """The weighted mean of the particles (Point), None if unknown."""
+        if self.xs is None:
+            return None
+        return Point(float(np.dot(self.weights, self.xs)),
+                     float(np.dot(self.weights, self.ys)))
+
+    def reset(self, heading, position=None, radius=None):
+        """Spread the particles.
+
+        Args:
+            heading: The heading in radian.
+
+            position: A Point around which the particles are spread. If
+                      None the particles are spread in the whole garden.
+
+            radius: The radius of the disc around position (meter).
+        """
+        garden = self.location.garden
+        xs = np.empty(0)
+        ys = np.empty(0)
+        while len(xs) < self.count:
+            if position is None:
+                (minx, miny, maxx, maxy) = garden.bounds
+                x = self.random.uniform(minx, maxx, self.count)
+                y = self.random.uniform(miny, maxy, self.count)
+            else:
+                rho = radius * np.sqrt(self.random.random(self.count))
+                theta = self.random.uniform(-math.pi, math.pi, self.count)
+                x = position.X + rho * np.cos(theta)
+                y = position.Y + rho * np.sin(theta)
+                if not garden.contains(x, y).any():
+                    # The odometry is outside of the garden
+                    position = None
+                    continue
+            inside = garden.contains(x, y)
+            xs = np.concatenate((xs, x[inside]))
+            ys = np.concatenate((ys, y[inside]))
+        self.xs = xs[:self.count]
+        self.ys = ys[:self.count]
+        self.headings = _wrap(heading + self.random.normal(
+            0.0, self.headingNoise, self.count))
+        self.weights = np.full(self.count, 1.0 / self.count)
+
+    def predict(self, dist):
+        """Move the particles forward along their heading.
+
+        The headings are perturbed so the particles can follow the turns.
+
+        Args:
+            dist: The distance traveled since the last prediction (meter).
+        """
+        self.headings = _wrap(self.headings + self.random.normal(
+            0.0, self.turnNoise, self.count))
+        if dist == 0:
+            return
+        dists = dist + self.random.normal(
+            0.0, self.odometryNoise * abs(dist), self.count)
+        self.xs = self.xs + dists * np.cos(self.headings)
+        self.ys = self.ys + dists * np.sin(self.headings)
+
+    def update(self, angleToDirection, *datas):
+        """Weight the particles with the datas of a frame.
+
+        Args:
+            angleToDirection: The angle of the magnetic captor.
+            datas: Data instances.
+        """
+        heading = headingFromNorth(self.location, angleToDirection)
+        error = _wrap(self.headings - heading) / self.headingNoise
+        if np.abs(error).min() > 3.0:
+            # The robot turned more than predicted: no particle fits the
+            # magnetic captor, their headings are drawn again around it
+            self.headings = _wrap(heading + self.random.normal(
+                0.0, self.headingNoise, self.count))
+            error = _wrap(self.headings - heading) / self.headingNoise
+        logWeights = -0.5 * error**2
+        for data in datas:
+            cameraAngle = _cameraAngle(self.location, data, angleToDirection)
+            predicted = self.headings - np.arctan2(
+                data.led.point.Y - self.ys, data.led.point.X - self.xs)
+            error = _wrap(cameraAngle - predicted) / self.bearingNoise
+            logWeights -= 0.5 * error**2
+        inside = self.location.garden.contains(self.xs, self.ys)
+        logWeights[~inside] = -np.inf
+
+        logWeights += np.log(self.weights)
+        if not np.isfinite(logWeights.max()):
+            # No particle is compatible with the datas
+            self.weights = np.full(self.count, 1.0 / self.count)
+            return
+        weights = np.exp(logWeights - logWeights.max())
+        self.weights = weights / weights.sum()
+
+    def resample(self):
+        """Systematic resampling of the particles."""
+        positions = (self.random.random() + np.arange(self.count)) / self.count
+        cumulative = np.cumsum(self.weights)
+        cumulative[-1] = 1.0
+        index = np.searchsorted(cumulative, positions)
+        self.xs = self.xs[index]
+        self.ys = self.ys[index]
+        self.headings = self.headings[index]
+        self.weights = np.full(self.count, 1.0 / self.count)
+
+    def computePos(self, angleToDirection, odometry, *datas):
+        """Update the particles with the datas of a frame.
+
+        Same arguments as Location.computePos. The distance of the odometry
+        is the distance traveled since the previous call. The first call
+        spreads the particles around the last position of the odometry, or
+        in the whole garden if odometry is None.
+
+        Returns:
+            The current estimate of the position (Point).
+        """
+        if self.xs is None:
+            heading = headingFromNorth(self.location, angleToDirection)
+            if odometry is None:
+                self.reset(heading)
+            else:
+                self.reset(heading, odometry.lastPos,
+                           odometry.dist + odometry._range)
+        elif odometry is not None:
+            self.predict(odometry.dist)
+        self.update(angleToDirection, *datas)
+        position = self.position
+        if 1.0 / np.sum(self.weights**2) < self.count / 2:
+            self.resample()
+        return position
@@ -60,6 +60,9 @@ class LED:
 
 
 def _getLED(color, perimeter):
+    # A compiled perimeter (garden.Garden) has an index by color
+    if hasattr(perimeter, 'getLED'):
+        return perimeter.getLED(color)
     for i in perimeter:
         if i.color == color:
             return i
@@ -82,6 +85,9 @@ class Data:
                   we cannot get this data.
 
         led: A LED class instance.
+
+    Raises:
+        ValueError: The color does not correspond to an existing LED.
     """
     _ids = count(0)
 
@@ -100,10 +106,7 @@ class Data:
         # (LED -> edge of perimeter)
         self.angle = angle + angleToDirection + angleNorth
         self.distance = distance
-        try:
-            self.led = _getLED(color, perimeter)
-        except ValueError as error:
-            print('The color does not correspond to an existing LED')
+        self.led = _getLED(color, perimeter)
 
     # adjust the distance between the inputted data and the one one
     # calculated with its angle.
@@ -120,10 +123,41 @@ class Data:
             dist: The distance. This value is expected to have been
                   computed from the angle. (float)
         """
-        if self.distance is None:
-            self.distance = dist
-        else:
-            theta = math.asin(self.led.height / self.distance)
-            adjustedDist = math.cos(theta) * self.distance
-            self.distance = (adjustedDist + dist) / 2
+        self.distance = adjustedDistance(self.distance, self.led.height, dist)
         return self.distance
+
+
+def adjustedDistance(distance, height, dist):
+    """Combine a distance with a distance computed from the angles.
+
+    See Data.adjustDistance, this version does not need a Data instance.
+
+    Args:
+        distance: The distance known so far, None if unknown.
+        height: The height of the LED.
+        dist: The distance computed from the angles.
+
+    Returns:
+        The adjusted distance.
+    """
+    if distance is None:
+        return dist
+    theta = math.asin(height / distance)
+    adjustedDist = math.cos(theta) * distance
+    return (adjustedDist + dist) / 2
+
+
+def datasFromBearings(bearings, angleNorth, angleToDirection, perimeter):
+    """Build the Data instances of raw bearings.
+
+    Args:
+        bearings: Iterable of tuples (color, angle) or (color, angle,
+                  distance). The color is a Color or its value.
+
+        angleNorth, angleToDirection, perimeter: See Data.
+
+    Returns:
+        A list of Data instances, in the order of the bearings.
+    """
+    return [Data(Color(bearing[0]), bearing[1], angleNorth, angleToDirection,
+                 perimeter, *bearing[2:]) for bearing in bearings]
@@ -28,6 +28,7 @@ setup(
     version=VERSION,
     license='MIT License',
     packages=['pleepleeloc'],
+    python_requires='>=3.7',
     include_package_data=True,
     zip_safe=False,  # Because of the certificate
     install_requires=[
@@ -35,8 +36,14 @@ setup(
         'sphinxcontrib-napoleon',
         'pytest',
         'pytest-mock',
+        'numpy',
         'shapely'
         ],
+    entry_points={
+        'console_scripts': [
+            'pleeplee-replay = pleepleeloc.replay:main',
+        ],
+    },
     description='PleePlee robot API for location',
     long_description=README,
     author='Loic BANET',
@@ -48,7 +55,9 @@ setup(
         'License :: OSI Approved :: MIT License',
         'Operating System :: OS Independent',
         'Programming Language :: Python',
-        'Programming Language :: Python :: 3.5',
+        'Programming Language :: Python :: 3',
+        'Programming Language :: Python :: 3 :: Only',
+        'Programming Language :: Python :: 3.7',
         'Framework :: Robot Framework',
         'Framework :: Robot Framework :: Tool',
         'Development Status :: 4 - Beta'
@@ -2,11 +2,13 @@
 
 import math
 
+import numpy as np
 import pytest
 from pytest_mock import mocker
 
 from pleepleeloc.compute import *
-from pleepleeloc.geometry import Point
+from pleepleeloc.garden import Garden
+from pleepleeloc.geometry import Point, unitVectors
 from pleepleeloc.utils import LED, Color, Data
 
 # Data needed for Mocks:
@@ -178,3 +180,315 @@ def test_sort_data():
     my_list = [Point(6.92, 5.78), Point(6.99, 5.81), Point(6.96, 5.80)]
     ref = Point(7.0, 5.8)
     assert sortData(my_list) == ref
+
+
+def test_intersect_circles_batch():
+    centers1 = [(0.0, 0.0), (0.0, 0.0), (0.0, 0.0), (0.0, 0.0), (0.0, 0.0)]
+    radii1 = [3.8, 1.0, 1.0, 2.0, 1.0]
+    centers2 = [(10.0, 0.0), (10.0, 0.0), (0.5, 0.0), (0.0, 0.0), (2.0, 0.0)]
+    radii2 = [9.4, 1.0, 5.0, 2.0, 1.0]
+
+    res = intersectCircles(centers1, radii1, centers2, radii2)
+    assert list(res.valid) == [True, False, False, False, True]
+    assert list(res.noIntersection) == [False, True, False, False, False]
+    assert list(res.contained) == [False, False, True, False, False]
+    assert list(res.coincident) == [False, False, False, True, False]
+    assert list(res.tangent) == [False, False, False, False, True]
+
+    candidates = res.candidates()
+    assert len(candidates) == 3
+    assert Point(*candidates[0]) == Point(1.3, 3.5)
+    assert Point(*candidates[1]) == Point(1.3, -3.5)
+    assert Point(*candidates[2]) == Point(1.0, 0.0)
+
+
+def test_compute_pairs_scalar_and_batch():
+    # A few pairs are intersected one by one, more in a batch: same result
+    args = [-45.0, -90.0, testPerimeter2]
+
+    def pairs():
+        # adjustDistance modifies the datas: new ones for each call
+        datas = [Data(Color.RED, 134.0, *args),
+                 Data(Color.YELLOW, 19.0, *args),
+                 Data(Color.BLUE, -25.0, *args)]
+        return [(datas[0], datas[1]), (datas[1], datas[2]),
+                (datas[0], datas[2])]
+
+    scalar = computePairs(pairs(), (-10.0, -10.0), *args)
+    batch = computePairs(pairs() + pairs(), (-10.0, -10.0), *args)
+    assert len(scalar) > 0
+    assert np.array_equal(batch.coords,
+                          np.concatenate((scalar.coords, scalar.coords)))
+
+
+def test_garden_pairs_match_perimeter_scan():
+    for perimeter in (testPerimeter1, testPerimeter2):
+        garden = Garden(perimeter)
+        for led1 in perimeter:
+            for led2 in perimeter:
+                if led1 is led2:
+                    continue
+                assert (isAdjacent(led1.color, led2.color, garden) ==
+                        isAdjacent(led1.color, led2.color, perimeter))
+                assert (vectorFromColors(led1, led2, garden) ==
+                        vectorFromColors(led1, led2, perimeter))
+
+
+def test_dist_from_angles_garden():
+    perimeter = testPerimeter2
+    garden = Garden(perimeter)
+    dirInit = (-10.0, -10.0)
+    angleNorth = -45.0
+    angleToDirection = -90.0
+    args = [angleNorth, angleToDirection, perimeter]
+    data1_t2 = Data(Color.YELLOW, 19.0, *args)
+    data2_t2 = Data(Color.BLUE, -25.0, *args)
+
+    assert (distanceFromAngles(data1_t2, data2_t2, dirInit, angleNorth,
+                               angleToDirection, garden) ==
+            distanceFromAngles(data1_t2, data2_t2, dirInit, angleNorth,
+                               angleToDirection, perimeter))
+
+
+def test_compute_all_pairs():
+    perimeter = Garden(testPerimeter2)
+    dirInit = (-10.0, -10.0)
+    angleNorth = -45.0
+    angleToDirection = -90.0
+    args = [angleNorth, angleToDirection, perimeter]
+
+    datas = [Data(Color.RED, 135.0, *args),
+             Data(Color.YELLOW, 18.43, *args),
+             Data(Color.BLUE, -26.57, *args),
+             Data(Color.GREEN, -153.43, *args)]
+
+    res = computeAllPairs(datas, dirInit, *args)
+    errorMargin = 0.01  # 1cm
+    good = [p for p in res if p.distance(Point(7.0, 7.0)) < errorMargin]
+    # 6 pairs, each has a solution next to the actual position
+    assert len(good) == 6
+    assert all(data.distance is None for data in datas)
+
+    res = computeAllPairs(datas, dirInit, *args, maxPairs=2)
+    assert len(res) <= 4
+    assert len(computeAllPairs(datas[:1], dirInit, *args)) == 0
+
+
+def test_compute_all_pairs_any_order():
+    perimeter = Garden(testPerimeter2)
+    dirInit = (-10.0, -10.0)
+    args = [-45.0, -90.0, perimeter]
+
+    # Right to left: the pairs do not need to be ordered
+    datas = [Data(Color.GREEN, -153.43, *args),
+             Data(Color.BLUE, -26.57, *args),
+             Data(Color.YELLOW, 18.43, *args),
+             Data(Color.RED, 135.0, *args)]
+
+    errorMargin = 0.01  # 1cm
+    res = computeAllPairs(datas, dirInit, *args)
+    good = [p for p in res if p.distance(Point(7.0, 7.0)) < errorMargin]
+    assert len(good) == 6
+
+
+def test_compute_all_pairs_rounding():
+    perimeter = Garden(testPerimeter2)
+    dirInit = (-10.0, -10.0)
+    args = [-45.0, -90.0, perimeter]
+    datas = [Data(Color.RED, 134.0, *args),
+             Data(Color.YELLOW, 19.0, *args)]
+
+    rounded = computeAllPairs(datas, dirInit, *args)
+    exact = computeAllPairs(datas, dirInit, *args, rounding=False)
+    assert len(rounded) == len(exact) > 0
+    assert np.array_equal(rounded.coords,
+                          np.round(exact.coords, PRECISION))
+    assert not np.array_equal(rounded.coords, exact.coords)
+
+
+def test_distances_from_directions():
+    dirInit = (-10.0, -10.0)
+    args = [-45.0, -90.0, testPerimeter2]
+    data1 = Data(Color.YELLOW, 18.43, *args)
+    data2 = Data(Color.BLUE, -26.57, *args)
+    directions = unitVectors(dirInit, [data1.angle, data2.angle])
+    baseline = [[-2.0, 4.0]]  # BLUE - YELLOW
+
+    (dist1, dist2) = distancesFromDirections(directions[:1], directions[1:],
+                                             baseline)
+    assert abs(dist1[0] - math.sqrt(40)) < 0.01
+    assert abs(dist2[0] - math.sqrt(20)) < 0.01
+    # Same direction twice: no solution
+    (dist1, dist2) = distancesFromDirections(directions[:1], directions[:1],
+                                             baseline)
+    assert dist1[0] == dist2[0] == 0.0
+
+
+def test_gate_datas():
+    perimeter = Garden(testPerimeter2)
+    dirInit = (-10.0, -10.0)
+    args = [-45.0, -90.0, perimeter]
+    outlier = Data(Color.YELLOW, 60.0, *args)
+    datas = [Data(Color.RED, 135.0, *args), outlier,
+             Data(Color.BLUE, -26.57, *args),
+             Data(Color.GREEN, -153.43, *args)]
+
+    kept = gateDatas(datas, dirInit, Point(6.9, 7.0), 0.4)
+    assert kept == [datas[0], datas[2], datas[3]]
+    # Far from the prediction: every data is rejected
+    assert gateDatas(datas, dirInit, Point(3.0, 8.0), 0.4) == []
+
+
+def test_compute_all_pairs_gate():
+    perimeter = Garden(testPerimeter2)
+    dirInit = (-10.0, -10.0)
+    args = [-45.0, -90.0, perimeter]
+    datas = [Data(Color.RED, 135.0, *args),
+             Data(Color.YELLOW, 60.0, *args),
+             Data(Color.BLUE, -26.57, *args),
+             Data(Color.GREEN, -153.43, *args)]
+    counts = {}
+
+    def hook(stage, duration, count):
+        counts[stage] = count
+
+    res = computeAllPairs(datas, dirInit, *args, hook=hook,
+                          gate=(Point(6.9, 7.0), 0.4))
+    # The three pairs with the outlier are skipped
+    assert counts[DISTANCES] == 3
+    good = [p for p in res if p.distance(Point(7.0, 7.0)) < 0.01]
+    assert len(good) == 3
+    assert len(computeAllPairs(datas, dirInit, *args,
+                               gate=(Point(3.0, 8.0), 0.4))) == 0
+
+
+def test_pair_quality():
+    directions = unitVectors((1.0, 0.0), [0.0, 90.0, 1.0, 180.0])
+    baselines = [[3.0, 4.0]] * 3
+    quality = pairQuality(directions[[0, 0, 0]], directions[1:], baselines)
+    assert abs(quality[0] - 5.0) < 1e-9
+    assert 0 < quality[1] < 0.1
+    assert abs(quality[2]) < 1e-9
+
+
+def test_compute_all_pairs_best_pairs():
+    perimeter = Garden(testPerimeter2)
+    dirInit = (-10.0, -10.0)
+    args = [-45.0, -90.0, perimeter]
+    datas = [Data(Color.RED, 135.0, *args),
+             Data(Color.YELLOW, 18.43, *args),
+             Data(Color.BLUE, -26.57, *args),
+             Data(Color.GREEN, -153.43, *args)]
+    directions = unitVectors(dirInit, [data.angle for data in datas])
+    leds = [[data.led.point.X, data.led.point.Y] for data in datas]
+    pairs = [(0, 1), (0, 2), (0, 3), (1, 2), (1, 3), (2, 3)]
+    quality = [pairQuality(directions[i], directions[j],
+                           np.subtract(leds[j], leds[i]))
+               for (i, j) in pairs]
+    # YELLOW - GREEN: nearly opposite bearings
+    assert np.argmin(quality) == 4
+    counts = {}
+
+    def hook(stage, duration, count):
+        counts[stage] = count
+
+    res = computeAllPairs(datas, dirInit, *args, maxPairs=5, hook=hook)
+    assert counts[DISTANCES] == 5
+    good = [p for p in res if p.distance(Point(7.0, 7.0)) < 0.01]
+    assert len(good) == 5
+
+
+def test_resect_least_squares():
+    perimeter = Garden(testPerimeter2)
+    dirInit = (-10.0, -10.0)
+    args = [-45.0, -90.0, perimeter]
+
+    datas = [Data(Color.GREEN, -153.43, *args),
+             Data(Color.RED, 135.0, *args),
+             Data(Color.BLUE, -26.57, *args),
+             Data(Color.YELLOW, 18.43, *args)]
+
+    errorMargin = 0.01  # 1cm
+    res = resectLeastSquares(datas, dirInit)
+    assert res.distance(Point(7.0, 7.0)) < errorMargin
+    res = resectLeastSquares(datas, dirInit, Point(6.5, 6.7))
+    assert res.distance(Point(7.0, 7.0)) < errorMargin
+    assert resectLeastSquares(datas[:1], dirInit) is None
+
+
+def test_resect_three_bearings():
+    perimeter = Garden(testPerimeter2)
+    dirInit = (-10.0, -10.0)
+    args = [-45.0, -90.0, perimeter]
+    data0 = Data(Color.RED, 135.0, *args)
+    data1 = Data(Color.YELLOW, 18.43, *args)
+    data2 = Data(Color.BLUE, -26.57, *args)
+
+    errorMargin = 0.01  # 1cm
+    (res, degenerate) = resectThreeBearings(data0, data1, data2, dirInit)
+    assert not degenerate
+    assert res.distance(Point(7.0, 7.0)) < errorMargin
+    (res, degenerate) = resectThreeBearings(data2, data0, data1, dirInit)
+    assert res.distance(Point(7.0, 7.0)) < errorMargin
+    (exact, degenerate) = resectThreeBearings(data0, data1, data2, dirInit,
+                                              rounding=False)
+    assert round(exact.X, PRECISION) == res.X
+    assert round(exact.Y, PRECISION) == res.Y
+
+
+def test_resect_three_bearings_degenerate():
+    perimeter = testPerimeter1
+    # On the circle going through the corners of the square
+    radius = 5 * math.sqrt(2)
+    x = 5 + radius * math.cos(0.3)
+    y = 5 + radius * math.sin(0.3)
+    datas = [Data(led.color,
+                  -math.degrees(math.atan2(led.point.Y - y, led.point.X - x)),
+                  0.0, 0.0, perimeter) for led in perimeter[:3]]
+
+    (res, degenerate) = resectThreeBearings(*datas, (1.0, 0.0))
+    assert degenerate
+    assert res is None
+
+
+def test_dominant_cluster():
+    coords = [(7.0, 7.0), (7.02, 6.97), (6.95, 7.04), (2.0, 8.0), (7.01, 7.0)]
+    members = dominantCluster(coords, 0.1, 80.0)
+    assert list(members) == [True, True, True, False, True]
+    assert dominantCluster(coords, 0.1, 90.0) is None
+    assert dominantCluster([], 0.1) is None
+    # Same points with enough copies to use the spatial hash
+    members = dominantCluster(coords * 5, 0.1, 80.0)
+    assert list(members) == [True, True, True, False, True] * 5
+
+
+def test_dominant_cluster_spread():
+    # 28cm wide: no consensus, with the direct comparison or the hash
+    coords = [(7.01, 7.01), (7.29, 7.01), (7.01, 7.29), (7.29, 7.29),
+              (7.15, 7.15)]
+    assert dominantCluster(coords, 0.1, 80.0) is None
+    assert dominantCluster(coords * 5, 0.1, 80.0) is None
+    assert sortData([Point(x, y) for (x, y) in coords]) is None
+
+
+def test_sort_data_no_consensus():
+    my_list = [Point(6.92, 5.78), Point(2.0, 8.0), Point(4.0, 1.0)]
+    assert sortData(my_list) is None
+    assert sortData([]) is None
+
+
+def test_compute_2_data_hook():
+    perimeter = Garden(testPerimeter2)
+    dirInit = (-10.0, -10.0)
+    args = [-45.0, -90.0, perimeter]
+    data1_t2 = Data(Color.YELLOW, 19.0, *args)
+    data2_t2 = Data(Color.BLUE, -25.0, *args)
+
+    stages = []
+    res = compute2Data(data1_t2, data2_t2, dirInit, *args,
+                       hook=lambda *stage: stages.append(stage))
+    assert [stage for (stage, _, _) in stages] == [DISTANCES, INTERSECTION,
+                                                   PERIMETER]
+    assert stages[0][2] == 1
+    assert stages[2][2] == len(res)
+    assert all(duration >= 0.0 for (_, duration, _) in stages)
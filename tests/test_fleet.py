@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import pytest
+
+from pleepleeloc import fleet
+from pleepleeloc.fleet import PROCESSES, THREADS, FleetServer
+from pleepleeloc.garden import Garden
+from pleepleeloc.geometry import Point
+from pleepleeloc.location import LEAST_SQUARES, Location
+from pleepleeloc.simulation import (Simulator, regularGarden,
+                                    waypointsTrajectory)
+from pleepleeloc.utils import LED, Color, Data
+
+# Data:
+
+perimeter = regularGarden(5)
+dirInit = (-10.0, -10.0)
+angleNorth = -45.0
+height = 0.0
+
+
+def frames(robot, waypoints):
+    """Frames of a simulated run, with the expected positions."""
+    (xs, ys, headings) = waypointsTrajectory(waypoints, 0.5)
+    run = Simulator(perimeter, dirInit, angleNorth).run(xs, ys, headings)
+    res = []
+    for (i, (angleToDirection, odometry, _)) in enumerate(run):
+        order = np.argsort(-run.bearings[i], kind='stable')
+        bearings = [(Color(int(run.colors[j])), float(run.bearings[i, j]))
+                    for j in order]
+        res.append((robot, angleToDirection, odometry, bearings))
+    return (res, run.positions)
+
+
+# Test functions:
+
+
+def test_fleet_shared_garden():
+    with FleetServer(*perimeter) as server:
+        first = server.addRobot('first', angleNorth, dirInit, height)
+        second = server.addRobot('second', angleNorth, dirInit, height)
+        assert first.garden is server.garden
+        assert second.garden is server.garden
+        with pytest.raises(KeyError):
+            server.submit('third', 0.0, None)
+    with pytest.raises(ValueError):
+        FleetServer(*perimeter, pool='gpu')
+
+
+@pytest.mark.parametrize('pool', [THREADS, PROCESSES])
+def test_fleet_compute_frames(pool):
+    (first, positions1) = frames('first', [(4.0, 4.0), (8.0, 5.0)])
+    (second, positions2) = frames('second', [(7.0, 3.0), (5.0, 8.0)])
+    # Interleaved frames of the two robots
+    tagged = [frame for pair in zip(first, second) for frame in pair]
+
+    with FleetServer(*perimeter, pool=pool, workers=2) as server:
+        for robot in ('first', 'second'):
+            server.addRobot(robot, angleNorth, dirInit, height,
+                            solver=LEAST_SQUARES)
+        res = server.computeFrames(tagged)
+
+    loc = Location(angleNorth, dirInit, height, *perimeter,
+                   solver=LEAST_SQUARES)
+    assert len(res) == len(tagged)
+    for (position, frame) in zip(res, tagged):
+        # Same result as a single Location
+        (_, angleToDirection, odometry, bearings) = frame
+        datas = [Data(color, angle, angleNorth, angleToDirection, loc.garden)
+                 for (color, angle) in bearings]
+        assert position == loc.computePos(angleToDirection, odometry, *datas)
+    for (position, actual) in zip(res[::2], positions1):
+        assert position.distance(Point(*actual)) < 0.01
+    for (position, actual) in zip(res[1::2], positions2):
+        assert position.distance(Point(*actual)) < 0.01
+
+
+def workerGarden():
+    return (fleet._worker['garden'].rectangle, fleet._worker['garden'].convex)
+
+
+def test_fleet_worker_garden_options():
+    rectangle = [LED(Color.RED, Point(0.0, 0.0)),
+                 LED(Color.YELLOW, Point(0.0, 10.0)),
+                 LED(Color.BLUE, Point(10.0, 10.0)),
+                 LED(Color.GREEN, Point(10.0, 0.0))]
+    # The workers compile the garden with the options of the server
+    with FleetServer(Garden(rectangle, rectangle=False), workers=1) as server:
+        assert server.pool == PROCESSES
+        assert server.executor.submit(workerGarden).result() == (False, True)
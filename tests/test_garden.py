@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import pytest
+import shapely
+
+from pleepleeloc.garden import Garden, compileGarden, isAxisAlignedRectangle
+from pleepleeloc.geometry import Point
+from pleepleeloc.simulation import regularGarden
+from pleepleeloc.utils import LED, Color
+
+# Data:
+
+corner1 = LED(Color.RED, Point(3.0, 3.0))
+corner2 = LED(Color.YELLOW, Point(13.0, 5.0))
+corner3 = LED(Color.BLUE, Point(11.0, 9.0))
+corner4 = LED(Color.GREEN, Point(1.0, 10.0))
+
+testPerimeter = [corner1, corner2, corner3, corner4]
+
+square = [LED(Color.RED, Point(0.0, 0.0)),
+          LED(Color.YELLOW, Point(0.0, 10.0)),
+          LED(Color.BLUE, Point(10.0, 10.0)),
+          LED(Color.GREEN, Point(10.0, 0.0))]
+
+# L shaped garden, clockwise
+concave = [LED(color, Point(x, y)) for (color, (x, y)) in zip(
+    [Color.RED, Color.GREEN, Color.BLUE, Color.YELLOW, Color.PURPLE,
+     Color.ORANGE],
+    [(0.0, 0.0), (0.0, 8.0), (4.0, 8.0), (4.0, 4.0), (8.0, 4.0), (8.0, 0.0)])]
+
+# Test functions:
+
+
+def test_garden_sequence():
+    garden = Garden(testPerimeter)
+    assert len(garden) == 4
+    assert list(garden) == testPerimeter
+    assert garden[2] is corner3
+    assert garden.bounds == (1.0, 3.0, 13.0, 10.0)
+
+
+def test_garden_contains():
+    garden = Garden(testPerimeter)
+    xs = [7.0, 1.3, 12.5, 2.0, 20.0]
+    ys = [7.0, -3.5, 8.0, 9.8, 7.0]
+    assert list(garden.contains(xs, ys)) == [True, False, False, True, False]
+
+
+def test_garden_contains_not_in_perimeter():
+    extra = LED(Color.WHITE, Point(7.0, 20.0), inPerimeter=False)
+    garden = Garden(testPerimeter + [extra])
+    assert len(garden) == 5
+    assert list(garden.contains([7.0, 7.0], [7.0, 15.0])) == [True, False]
+
+
+def test_compile_garden():
+    garden = Garden(testPerimeter)
+    assert compileGarden(garden) is garden
+    assert isinstance(compileGarden(testPerimeter), Garden)
+
+
+def test_garden_get_led():
+    garden = Garden(testPerimeter)
+    assert garden.getLED(Color.BLUE) is corner3
+    with pytest.raises(ValueError):
+        garden.getLED(Color.WHITE)
+
+
+def test_garden_duplicate_color():
+    duplicate = LED(Color.RED, Point(7.0, 20.0))
+    with pytest.raises(ValueError):
+        Garden(testPerimeter + [duplicate])
+
+
+def test_garden_too_few_leds():
+    outside = [LED(led.color, led.point, inPerimeter=False)
+               for led in testPerimeter]
+    with pytest.raises(ValueError, match='at least 3 LEDs'):
+        Garden(outside)
+    with pytest.raises(ValueError, match='at least 3 LEDs'):
+        Garden(testPerimeter[:2])
+
+
+@pytest.mark.parametrize('perimeter', [testPerimeter, square, concave,
+                                       regularGarden(5), regularGarden(7)])
+def test_garden_contains_like_shapely(perimeter):
+    garden = Garden(perimeter)
+    (minx, miny, maxx, maxy) = garden.bounds
+    random = np.random.default_rng(0)
+    xs = random.uniform(minx - 1, maxx + 1, 5000)
+    ys = random.uniform(miny - 1, maxy + 1, 5000)
+    # Vertices, middle of the edges and a grid aligned with the vertices
+    vertices = garden.vertices
+    middles = (vertices + np.roll(vertices, -1, axis=0)) / 2
+    (gridX, gridY) = np.meshgrid(np.arange(np.floor(minx), maxx + 1),
+                                 np.arange(np.floor(miny), maxy + 1))
+    xs = np.concatenate((xs, vertices[:, 0], middles[:, 0], gridX.ravel()))
+    ys = np.concatenate((ys, vertices[:, 1], middles[:, 1], gridY.ravel()))
+
+    expected = shapely.contains_xy(garden.polygon, xs, ys)
+    assert np.array_equal(garden.contains(xs, ys), expected)
+
+
+def test_is_axis_aligned_rectangle():
+    assert isAxisAlignedRectangle([(0, 0), (0, 5), (8, 5), (8, 0)])
+    assert not isAxisAlignedRectangle([(0, 0), (8, 5), (0, 5), (8, 0)])
+    assert not isAxisAlignedRectangle([(5, 0), (0, 5), (5, 10), (10, 5)])
+    assert not isAxisAlignedRectangle([(0, 0), (0, 5), (8, 5)])
+    assert not isAxisAlignedRectangle(Garden(testPerimeter).vertices)
+
+
+def test_garden_rectangle():
+    garden = Garden(square)
+    assert garden.rectangle
+    assert not Garden(testPerimeter).rectangle
+    assert not Garden(square, rectangle=False).rectangle
+    with pytest.raises(ValueError):
+        Garden(testPerimeter, rectangle=True)
+
+    xs = [5.0, 0.0, 10.0, 3.0, 12.0]
+    ys = [5.0, 5.0, 3.0, 9.99, 5.0]
+    general = Garden(square, rectangle=False)
+    assert list(garden.contains(xs, ys)) == [True, False, False, True, False]
+    assert list(general.contains(xs, ys)) == list(garden.contains(xs, ys))
@@ -1,9 +1,15 @@
 #!/usr/bin/env python
 
+import pickle
 from math import sqrt
 
-from pleepleeloc.geometry import (PRECISION, Point, angleBetween2Vects,
-                               rotateVector)
+import numpy as np
+import pytest
+
+from pleepleeloc.geometry import (PRECISION, Point, PointArray,
+                                  angleBetween2Vects, cross, dot, isConvex,
+                                  pointsInConvexPolygon, pointsInPolygon,
+                                  polygonEdges, rotateVector, unitVectors)
 from pleepleeloc.utils import Color
 
 
@@ -46,3 +52,91 @@ def test_angle_two_vects():
     assert angleBetween2Vects((10, 0), (0, 10)) == 90
     val = round(5 * sqrt(2), PRECISION)
     assert angleBetween2Vects((10, 0), (val, -val)) == -45
+
+
+def test_point_immutable():
+    point = Point(2.0, 4.5)
+    with pytest.raises(AttributeError):
+        point.X = 3.0
+    with pytest.raises(AttributeError):
+        point.Z = 3.0
+    assert not hasattr(point, '__dict__')
+
+
+def test_point_pickle_not_hashable():
+    # == has a tolerance, so Points cannot be used in sets or as keys
+    assert Point(7.0, 7.0) == Point(7.01, 7.0)
+    assert not Point(7.0, 7.0) != Point(7.01, 7.0)
+    with pytest.raises(TypeError):
+        hash(Point(2.0, 4.5))
+    point = pickle.loads(pickle.dumps(Point(2.0, 4.5)))
+    assert (point.X, point.Y) == (2.0, 4.5)
+
+
+def test_point_array():
+    points = PointArray.fromPoints([Point(1.3, 3.5), Point(1.3, -3.5)])
+    assert len(points) == 2
+    assert points.coords.dtype == np.float64
+    assert points.coords.flags['C_CONTIGUOUS']
+    assert points[1] == Point(1.3, -3.5)
+    assert Point(1.3, 3.5) in points
+    assert Point(3.0, 3.5) not in points
+    assert list(points.Y) == [3.5, -3.5]
+    assert len(points[points.Y > 0]) == 1
+    assert points.mean() == Point(1.3, 0.0)
+    assert PointArray().mean() is None
+
+
+def test_point_array_concat():
+    points = PointArray([(1.0, 2.0)])
+    assert len(points + PointArray([(3.0, 4.0)])) == 2
+    assert len(points + [Point(3.0, 4.0)]) == 2
+    assert len([Point(3.0, 4.0)] + points) == 2
+    assert list(points.distances(Point(4.0, 6.0))) == [5.0]
+
+
+def test_unit_vectors():
+    vect = (3.0, 4.0)
+    res = unitVectors(vect, [0.0, 90.0, -30.0])
+    for (alpha, unit) in zip([0.0, 90.0, -30.0], res):
+        (x, y) = rotateVector(vect, alpha)
+        assert abs(unit[0] - x / 5) < 1e-3
+        assert abs(unit[1] - y / 5) < 1e-3
+    assert np.allclose(dot(res, res), 1.0)
+    # Rotation clockwise by 90 degrees
+    assert abs(cross(res[0], res[1]) + 1.0) < 1e-12
+    assert abs(dot(res[0], res[1])) < 1e-12
+
+
+def test_points_in_polygon():
+    edges = polygonEdges([(0.0, 0.0), (0.0, 3.0), (3.0, 3.0), (3.0, 0.0)])
+    xs = [1.0, 0.0, 1.5, 3.0, 4.0, 0.1 + 0.2]
+    ys = [1.0, 1.0, 3.0, 3.0, 1.0, 0.3]
+    res = pointsInPolygon(xs, ys, edges)
+    # On the edges and vertices: outside
+    assert list(res) == [True, False, False, False, False, True]
+    # Too close to a diagonal edge for floats: same result as shapely
+    edges = polygonEdges([(0.0, 0.0), (0.1, 0.3), (1.0, 0.0)])
+    assert not pointsInPolygon([0.05], [0.15], edges)[0]
+
+
+def test_points_in_convex_polygon():
+    clockwise = polygonEdges([(3.0, 3.0), (1.0, 10.0), (11.0, 9.0),
+                              (13.0, 5.0)])
+    counterClockwise = polygonEdges([(13.0, 5.0), (11.0, 9.0), (1.0, 10.0),
+                                     (3.0, 3.0)])
+    concave = polygonEdges([(3.0, 3.0), (1.0, 10.0), (6.0, 8.0),
+                            (11.0, 9.0), (13.0, 5.0)])
+    assert isConvex(clockwise)
+    assert isConvex(counterClockwise)
+    assert not isConvex(concave)
+
+    random = np.random.default_rng(0)
+    xs = random.uniform(0.0, 14.0, 1000)
+    ys = random.uniform(2.0, 11.0, 1000)
+    expected = pointsInPolygon(xs, ys, clockwise)
+    assert np.array_equal(pointsInConvexPolygon(xs, ys, clockwise), expected)
+    assert np.array_equal(pointsInConvexPolygon(xs, ys, counterClockwise),
+                          expected)
+    # On an edge and on a vertex
+    assert not pointsInConvexPolygon([2.0, 3.0], [6.5, 3.0], clockwise).any()
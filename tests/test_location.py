@@ -1,10 +1,16 @@
 #!/usr/bin/env python3
 
+import logging
+
 import pytest
 from pytest_mock import mocker
 
-from pleepleeloc.geometry import Point
-from pleepleeloc.location import Location, Odometry, filterOdometry
+from pleepleeloc.compute import (CONSENSUS, DISTANCES, GATING, INTERSECTION,
+                                 ODOMETRY, PERIMETER, RESECTION)
+from pleepleeloc.geometry import Point, PointArray
+from pleepleeloc.location import (ALL_PAIRS, CLOSED_FORM, LEAST_SQUARES,
+                                  Location, Odometry, StageStatistics,
+                                  filterOdometry)
 from pleepleeloc.utils import LED, Color, Data
 
 
@@ -14,7 +20,7 @@ def test_odometry():
 
 
 def test_filter_odometry(mocker):
-    mocker.patch('pleeplee.location.Odometry._range', 0.03)
+    mocker.patch('pleepleeloc.location.Odometry._range', 0.03)
     lastPos = Odometry(Point(2.0, 4.0), 1.2)
     solutions = [Point(2.5, 4.2), Point(2.9, 4.9), Point(0.0, 0.0)]
     print(Point(2.0, 4.0).distance(Point(2.9, 4.9)))
@@ -23,7 +29,7 @@ def test_filter_odometry(mocker):
 
 
 def test_location_compute_pos(mocker):
-    mocker.patch('pleeplee.location.Odometry._range', 0.03)
+    mocker.patch('pleepleeloc.location.Odometry._range', 0.03)
     # Data set
     corner1 = LED(Color.RED, Point(3.0, 3.0))
     corner2 = LED(Color.YELLOW, Point(13.0, 5.0))
@@ -48,3 +54,209 @@ def test_location_compute_pos(mocker):
     loc = Location(angleNorth, dirInit, height, *perimeter)
     assert loc.computePos(angleToDirection, odometry, *datas) == Point(
         7.0, 7.0)
+
+
+def test_location_compute_pos_all_pairs(mocker):
+    mocker.patch('pleepleeloc.location.Odometry._range', 0.03)
+    corner1 = LED(Color.RED, Point(3.0, 3.0))
+    corner2 = LED(Color.YELLOW, Point(13.0, 5.0))
+    corner3 = LED(Color.BLUE, Point(11.0, 9.0))
+    corner4 = LED(Color.GREEN, Point(1.0, 10.0))
+    perimeter = [corner1, corner2, corner3, corner4]
+
+    dirInit = (-10.0, -10.0)
+    angleNorth = -45.0
+    angleToDirection = -90.0
+    height = 0.0
+    loc = Location(angleNorth, dirInit, height, *perimeter,
+                   solver=ALL_PAIRS, maxPairs=6)
+    args = [angleNorth, angleToDirection, loc.garden]
+
+    data0 = Data(Color.RED, 135.0, *args)
+    data1 = Data(Color.YELLOW, 18.43, *args)
+    data2 = Data(Color.BLUE, -26.57, *args)
+    data3 = Data(Color.GREEN, -153.43, *args)
+    datas = [data0, data1, data2, data3]
+
+    odometry = Odometry(Point(6.5, 6.7), 0.6)
+    assert loc.computePos(angleToDirection, odometry, *datas) == Point(
+        7.0, 7.0)
+
+
+def test_location_unknown_solver():
+    perimeter = [LED(Color.RED, Point(0.0, 0.0)),
+                 LED(Color.YELLOW, Point(0.0, 10.0)),
+                 LED(Color.BLUE, Point(10.0, 10.0))]
+    with pytest.raises(ValueError):
+        Location(0.0, (1.0, 0.0), 0.0, *perimeter, solver='magic')
+
+
+def test_location_compute_pos_least_squares():
+    corner1 = LED(Color.RED, Point(3.0, 3.0))
+    corner2 = LED(Color.YELLOW, Point(13.0, 5.0))
+    corner3 = LED(Color.BLUE, Point(11.0, 9.0))
+    corner4 = LED(Color.GREEN, Point(1.0, 10.0))
+    perimeter = [corner1, corner2, corner3, corner4]
+
+    dirInit = (-10.0, -10.0)
+    angleNorth = -45.0
+    angleToDirection = -90.0
+    height = 0.0
+    loc = Location(angleNorth, dirInit, height, *perimeter,
+                   solver=LEAST_SQUARES)
+    args = [angleNorth, angleToDirection, loc.garden]
+
+    data0 = Data(Color.RED, 134.0, *args)
+    data1 = Data(Color.YELLOW, 19.0, *args)
+    data2 = Data(Color.BLUE, -25.0, *args)
+    datas = [data0, data1, data2]
+
+    odometry = Odometry(Point(6.5, 6.7), 0.6)
+    assert loc.computePos(angleToDirection, odometry, *datas) == Point(
+        7.0, 7.0)
+
+
+def test_location_compute_pos_closed_form():
+    corner1 = LED(Color.RED, Point(3.0, 3.0))
+    corner2 = LED(Color.YELLOW, Point(13.0, 5.0))
+    corner3 = LED(Color.BLUE, Point(11.0, 9.0))
+    corner4 = LED(Color.GREEN, Point(1.0, 10.0))
+    perimeter = [corner1, corner2, corner3, corner4]
+
+    dirInit = (-10.0, -10.0)
+    angleNorth = -45.0
+    angleToDirection = -90.0
+    height = 0.0
+    loc = Location(angleNorth, dirInit, height, *perimeter,
+                   solver=CLOSED_FORM)
+    args = [angleNorth, angleToDirection, loc.garden]
+
+    data0 = Data(Color.RED, 134.0, *args)
+    data1 = Data(Color.YELLOW, 19.0, *args)
+    data2 = Data(Color.BLUE, -25.0, *args)
+
+    odometry = Odometry(Point(6.5, 6.7), 0.6)
+    assert loc.computePos(angleToDirection, odometry, data0, data1,
+                          data2) == Point(7.0, 7.0)
+    # Two datas only: same as the triangulation
+    assert loc.computePos(angleToDirection, odometry, data1,
+                          data2) == Point(7.0, 7.0)
+
+
+def test_location_stage_statistics():
+    corner1 = LED(Color.RED, Point(3.0, 3.0))
+    corner2 = LED(Color.YELLOW, Point(13.0, 5.0))
+    corner3 = LED(Color.BLUE, Point(11.0, 9.0))
+    corner4 = LED(Color.GREEN, Point(1.0, 10.0))
+    perimeter = [corner1, corner2, corner3, corner4]
+
+    dirInit = (-10.0, -10.0)
+    angleNorth = -45.0
+    angleToDirection = -90.0
+    stats = StageStatistics()
+    loc = Location(angleNorth, dirInit, 0.0, *perimeter, hook=stats)
+    args = [angleNorth, angleToDirection, loc.garden]
+    datas = [Data(Color.RED, 134.0, *args), Data(Color.YELLOW, 19.0, *args),
+             Data(Color.BLUE, -25.0, *args)]
+    odometry = Odometry(Point(6.5, 6.7), 0.6)
+
+    loc.computePos(angleToDirection, odometry, *datas)
+    for stage in (DISTANCES, INTERSECTION, PERIMETER, ODOMETRY, CONSENSUS):
+        assert stats.calls[stage] == 1
+        assert stats.meanDuration(stage) >= 0.0
+    assert stats.candidates[DISTANCES] == 3
+    assert stats.candidates[CONSENSUS] == 1
+    assert stats.meanDuration(RESECTION) == 0.0
+
+    loc.solver = LEAST_SQUARES
+    loc.computePos(angleToDirection, odometry, *datas)
+    assert stats.calls[RESECTION] == 1
+    assert stats.calls[CONSENSUS] == 2
+
+
+def test_location_logging(caplog):
+    corner1 = LED(Color.RED, Point(3.0, 3.0))
+    corner2 = LED(Color.YELLOW, Point(13.0, 5.0))
+    corner3 = LED(Color.BLUE, Point(11.0, 9.0))
+    perimeter = [corner1, corner2, corner3]
+    loc = Location(0.0, (1.0, 0.0), 0.0, *perimeter)
+    data = Data(Color.RED, 134.0, 0.0, 0.0, loc.garden)
+
+    with caplog.at_level(logging.INFO, logger='pleepleeloc'):
+        assert loc.computePos(0.0, None, data) is None
+    assert 'Not enough data' in caplog.text
+
+
+def test_filter_odometry_point_array(mocker):
+    mocker.patch('pleepleeloc.location.Odometry._range', 0.03)
+    lastPos = Odometry(Point(2.0, 4.0), 1.2)
+    solutions = PointArray([(2.5, 4.2), (2.9, 4.9), (0.0, 0.0)])
+    rest = filterOdometry(solutions, lastPos)
+    assert isinstance(rest, PointArray)
+    assert len(rest) == 1
+
+
+def test_location_cache():
+    corner1 = LED(Color.RED, Point(3.0, 3.0))
+    corner2 = LED(Color.YELLOW, Point(13.0, 5.0))
+    corner3 = LED(Color.BLUE, Point(11.0, 9.0))
+    corner4 = LED(Color.GREEN, Point(1.0, 10.0))
+    perimeter = [corner1, corner2, corner3, corner4]
+
+    dirInit = (-10.0, -10.0)
+    angleNorth = -45.0
+    angleToDirection = -90.0
+    stats = StageStatistics()
+    loc = Location(angleNorth, dirInit, 0.0, *perimeter, solver=LEAST_SQUARES,
+                   hook=stats, cacheSize=2)
+    args = [angleNorth, angleToDirection, loc.garden]
+    odometry = Odometry(Point(6.5, 6.7), 0.6)
+
+    def frame(*angles):
+        return [Data(color, angle, *args) for (color, angle) in
+                zip((Color.RED, Color.YELLOW, Color.BLUE), angles)]
+
+    position = loc.computePos(angleToDirection, odometry,
+                              *frame(134.0, 19.0, -25.0))
+    assert position == Point(7.0, 7.0)
+    # Same frame within the buckets: not computed again
+    assert loc.computePos(angleToDirection, odometry,
+                          *frame(134.01, 19.0, -25.0)) is position
+    assert (loc.cache.hits, loc.cache.misses) == (1, 1)
+    assert stats.calls[RESECTION] == 1
+
+    loc.computePos(angleToDirection, odometry, *frame(134.5, 19.0, -25.0))
+    loc.computePos(angleToDirection, odometry, *frame(135.0, 19.0, -25.0))
+    assert len(loc.cache) == 2
+    # The first frame was evicted
+    loc.computePos(angleToDirection, odometry, *frame(134.0, 19.0, -25.0))
+    assert loc.cache.misses == 4
+    assert stats.calls[RESECTION] == 4
+
+
+def test_location_gating():
+    corner1 = LED(Color.RED, Point(3.0, 3.0))
+    corner2 = LED(Color.YELLOW, Point(13.0, 5.0))
+    corner3 = LED(Color.BLUE, Point(11.0, 9.0))
+    corner4 = LED(Color.GREEN, Point(1.0, 10.0))
+    perimeter = [corner1, corner2, corner3, corner4]
+
+    dirInit = (-10.0, -10.0)
+    angleNorth = -45.0
+    angleToDirection = -90.0
+    stats = StageStatistics()
+    loc = Location(angleNorth, dirInit, 0.0, *perimeter, hook=stats,
+                   gating=True)
+    args = [angleNorth, angleToDirection, loc.garden]
+    # The YELLOW blob is a reflection
+    datas = [Data(Color.RED, 135.0, *args), Data(Color.YELLOW, 60.0, *args),
+             Data(Color.BLUE, -26.57, *args),
+             Data(Color.GREEN, -153.43, *args)]
+    odometry = Odometry(Point(6.9, 7.0), 0.1)
+
+    assert loc.computePos(angleToDirection, odometry, *datas) == Point(
+        7.0, 7.0)
+    assert stats.candidates[GATING] == 3
+
+    loc.gating = False
+    assert loc.computePos(angleToDirection, odometry, *datas) is None
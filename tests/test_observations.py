@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import pytest
+from pytest_mock import mocker
+
+from pleepleeloc.compute import (compute3Data, computeAllPairs, gateDatas,
+                                 resectFirstThree, resectLeastSquares,
+                                 resectThreeBearings, triangulate)
+from pleepleeloc.garden import Garden
+from pleepleeloc.geometry import Point
+from pleepleeloc.location import (ALL_PAIRS, CLOSED_FORM, LEAST_SQUARES,
+                                  TRIANGULATION, Location, Odometry)
+from pleepleeloc.observations import ObservationBatch
+from pleepleeloc.utils import LED, Color, Data
+
+# Data:
+
+corner1 = LED(Color.RED, Point(3.0, 3.0))
+corner2 = LED(Color.YELLOW, Point(13.0, 5.0))
+corner3 = LED(Color.BLUE, Point(11.0, 9.0))
+corner4 = LED(Color.GREEN, Point(1.0, 10.0))
+
+testPerimeter = [corner1, corner2, corner3, corner4]
+
+dirInit = (-10.0, -10.0)
+angleNorth = -45.0
+angleToDirection = -90.0
+
+# Bearings seen from (7, 7), from left to right
+bearings = [(Color.RED, 135.0), (Color.YELLOW, 18.43), (Color.BLUE, -26.57),
+            (Color.GREEN, -153.43)]
+
+# Test functions:
+
+
+def test_observation_batch_from_bearings():
+    garden = Garden(testPerimeter)
+    frames = [bearings, bearings[:2], [(Color.BLUE.value, 10.0, 4.5)]]
+    batch = ObservationBatch.fromBearings(frames, angleNorth,
+                                          [-90.0, -80.0, -70.0], garden)
+    assert len(batch) == 7
+    assert batch.frames == 3
+    assert list(batch.offsets) == [0, 4, 6, 7]
+    assert batch.colors.dtype == np.int8
+
+    datas = [Data(color, angle, angleNorth, -80.0, garden)
+             for (color, angle) in bearings[:2]]
+    frame = batch.frame(1)
+    assert len(frame) == 2
+    assert list(frame.angles) == [data.angle for data in datas]
+    assert list(map(tuple, frame.centers)) == [
+        (data.led.point.X, data.led.point.Y) for data in datas]
+    assert np.isnan(frame.distances).all()
+    assert batch.frame(2).distances[0] == 4.5
+
+    (data,) = batch.frame(2).toDatas()
+    assert data.led is corner3
+    assert data.angle == 10.0 - 70.0 + angleNorth
+    assert data.distance == 4.5
+
+    with pytest.raises(ValueError):
+        ObservationBatch.fromBearings([[(Color.WHITE, 0.0)]], angleNorth,
+                                      angleToDirection, garden)
+
+
+@pytest.mark.parametrize('code', [-1, len(Color), 200])
+def test_observation_batch_bad_color(code):
+    garden = Garden(testPerimeter + [LED(Color.WHITE, Point(7.0, 0.0),
+                                         inPerimeter=False)])
+    with pytest.raises(ValueError, match='Color not found'):
+        ObservationBatch.fromArrays([Color.RED.value, code], [0.0, 10.0],
+                                    angleNorth, angleToDirection, garden)
+
+
+def test_compute_observation_batch():
+    garden = Garden(testPerimeter)
+    args = [angleNorth, angleToDirection, garden]
+    batch = ObservationBatch.fromBearings([bearings], *args)
+    datas = [Data(color, angle, *args) for (color, angle) in bearings]
+
+    # adjustDistance modifies the datas: new ones for compute3Data
+    candidates = compute3Data(*[Data(color, angle, *args)
+                                for (color, angle) in bearings[:3]],
+                              dirInit, *args)
+    assert np.array_equal(triangulate(batch, dirInit, *args).coords,
+                          candidates.coords)
+    assert resectFirstThree(batch, dirInit) == resectThreeBearings(
+        *datas[:3], dirInit)
+
+    res = computeAllPairs(batch, dirInit, *args)
+    assert np.array_equal(res.coords,
+                          computeAllPairs(datas, dirInit, *args).coords)
+    assert resectLeastSquares(batch, dirInit) == resectLeastSquares(
+        datas, dirInit)
+    # The YELLOW blob is a reflection
+    outlier = ObservationBatch.fromBearings(
+        [bearings[:1] + [(Color.YELLOW, 60.0)] + bearings[2:]], *args)
+    kept = gateDatas(outlier, dirInit, Point(6.9, 7.0), 0.4)
+    assert isinstance(kept, ObservationBatch)
+    assert list(kept.colors) == [Color.RED.value, Color.BLUE.value,
+                                 Color.GREEN.value]
+
+
+@pytest.mark.parametrize('solver', [TRIANGULATION, ALL_PAIRS, LEAST_SQUARES,
+                                    CLOSED_FORM])
+def test_location_observation_batch(solver, mocker):
+    loc = Location(angleNorth, dirInit, 0.0, *testPerimeter, solver=solver,
+                   cacheSize=4, gating=True)
+    args = [angleNorth, angleToDirection, loc.garden]
+    batch = ObservationBatch.fromBearings([bearings], *args)
+    datas = [Data(color, angle, *args) for (color, angle) in bearings]
+    odometry = Odometry(Point(6.9, 7.0), 0.1)
+
+    spy = mocker.spy(Data, '__init__')
+    position = loc.computePos(angleToDirection, odometry, batch)
+    # The columns of the batch are used directly
+    assert spy.call_count == 0
+    assert position.distance(Point(7.0, 7.0)) < 0.01
+    assert position == loc.computePos(angleToDirection, odometry, *datas)
+    # Same key for the batch and the datas
+    assert loc.cache.hits == 1
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+import csv
+import json
+
+from pleepleeloc.geometry import Point
+from pleepleeloc.location import LEAST_SQUARES, Location
+from pleepleeloc.replay import main, readFrames, readRuns
+from pleepleeloc.simulation import (Simulator, regularGarden,
+                                    waypointsTrajectory)
+from pleepleeloc.utils import Color
+
+# Data:
+
+perimeter = regularGarden(5)
+dirInit = (-10.0, -10.0)
+angleNorth = -45.0
+height = 0.0
+
+
+def simulatedRun(waypoints):
+    (xs, ys, headings) = waypointsTrajectory(waypoints, 0.5)
+    return Simulator(perimeter, dirInit, angleNorth).run(xs, ys, headings)
+
+
+def writeConfig(path):
+    config = {'angleNorth': angleNorth, 'dirInit': list(dirInit),
+              'height': height,
+              'perimeter': [[led.color.name, led.point.X, led.point.Y]
+                            for led in perimeter]}
+    path.write(json.dumps(config))
+
+
+def writeCSV(run, path, name):
+    with open(str(path), 'w', newline='') as log:
+        writer = csv.writer(log)
+        writer.writerow(('run', 'frame', 'angleToDirection', 'lastX',
+                         'lastY', 'dist', 'color', 'angle'))
+        for (i, (angleToDirection, odometry, _)) in enumerate(run):
+            for (color, angle) in zip(run.colors, run.bearings[i]):
+                writer.writerow((name, i, angleToDirection,
+                                 odometry.lastPos.X, odometry.lastPos.Y,
+                                 odometry.dist, Color(int(color)).name,
+                                 angle))
+
+
+# Test functions:
+
+
+def test_read_formats(tmpdir):
+    run = simulatedRun([(4.0, 4.0), (8.0, 4.0)])
+    run.writeJSONL(str(tmpdir.join('run.jsonl')), 'first')
+    writeCSV(run, tmpdir.join('run.csv'), 'first')
+
+    jsonl = list(readFrames(str(tmpdir.join('run.jsonl'))))
+    csvFrames = list(readFrames(str(tmpdir.join('run.csv'))))
+    assert len(jsonl) == len(csvFrames) == len(run)
+    for (first, second) in zip(jsonl, csvFrames):
+        assert first[:2] == second[:2]
+        assert first[4] == second[4]
+
+
+def test_replay(tmpdir, capsys):
+    runs = {'first': simulatedRun([(4.0, 4.0), (8.0, 4.0)]),
+            'second': simulatedRun([(6.0, 3.0), (6.0, 8.0)])}
+    runs['first'].writeJSONL(str(tmpdir.join('first.jsonl')), 'first')
+    writeCSV(runs['second'], tmpdir.join('second.csv'), 'second')
+    writeConfig(tmpdir.join('garden.json'))
+    logs = [str(tmpdir.join('first.jsonl')), str(tmpdir.join('second.csv'))]
+    assert [run for (run, _) in readRuns(logs)] == ['first', 'second']
+
+    main(['--config', str(tmpdir.join('garden.json')),
+          '--output', str(tmpdir.join('out.csv')), '--workers', '2',
+          '--solver', LEAST_SQUARES] + logs)
+
+    with open(str(tmpdir.join('out.csv'))) as output:
+        rows = list(csv.DictReader(output))
+    assert len(rows) == len(runs['first']) + len(runs['second'])
+    for row in rows:
+        actual = runs[row['run']].positions[int(row['frame'])]
+        position = Point(float(row['x']), float(row['y']))
+        assert position.distance(Point(*actual)) < 0.01
+    err = capsys.readouterr().err
+    assert 'Replayed %d frames of 2 runs' % len(rows) in err
+    assert 'frames/s' in err
+
+
+def test_replay_default_solver(tmpdir):
+    # The log keeps the bearings in the order of the LEDs, the replay sorts
+    # them from left to right for the TRIANGULATION solver
+    run = simulatedRun([(4.0, 4.0), (8.0, 4.0)])
+    run.writeJSONL(str(tmpdir.join('run.jsonl')), 'run')
+    writeConfig(tmpdir.join('garden.json'))
+
+    main(['--config', str(tmpdir.join('garden.json')),
+          '--output', str(tmpdir.join('out.csv')), '--workers', '1',
+          str(tmpdir.join('run.jsonl'))])
+
+    with open(str(tmpdir.join('out.csv'))) as output:
+        rows = list(csv.DictReader(output))
+    loc = Location(angleNorth, dirInit, height, *perimeter)
+    found = 0
+    for (row, frame) in zip(rows, run):
+        # Same positions as the frames of the simulator
+        expected = loc.computePos(*frame[:2], *frame[2])
+        if expected is None:
+            assert row['x'] == row['y'] == ''
+            continue
+        found += 1
+        position = Point(float(row['x']), float(row['y']))
+        assert (position.X, position.Y) == (expected.X, expected.Y)
+        actual = run.positions[int(row['frame'])]
+        assert position.distance(Point(*actual)) < 0.01
+    assert len(rows) == len(run)
+    assert found > len(rows) // 2
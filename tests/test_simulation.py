@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+import json
+
+import numpy as np
+
+from pleepleeloc.geometry import Point
+from pleepleeloc.location import LEAST_SQUARES, Location
+from pleepleeloc.simulation import (SimulatedRun, Simulator, regularGarden,
+                                    waypointsTrajectory)
+from pleepleeloc.utils import Color
+
+# Data:
+
+dirInit = (-10.0, -10.0)
+angleNorth = -45.0
+height = 0.0
+
+# Test functions:
+
+
+def test_regular_garden():
+    garden = regularGarden(5)
+    assert len(garden) == 5
+    assert len(set(led.color for led in garden)) == 5
+    assert Color.NONE not in [led.color for led in garden]
+    # Clockwise with the y axis of the map going down (see compute.py):
+    # positive signed area
+    area = sum(a.point.X * b.point.Y - b.point.X * a.point.Y
+               for (a, b) in zip(garden, garden[1:] + garden[:1]))
+    assert area > 0
+
+
+def test_waypoints_trajectory():
+    (xs, ys, headings) = waypointsTrajectory([(4.0, 4.0), (8.0, 4.0),
+                                              (8.0, 6.0)], 0.5)
+    assert len(xs) == 13
+    assert (xs[0], ys[0]) == (4.0, 4.0)
+    assert (xs[-1], ys[-1]) == (8.0, 6.0)
+    assert headings[0] == 0.0
+    assert headings[-1] == 90.0
+
+
+def test_simulator_exact_frames():
+    perimeter = regularGarden(6)
+    loc = Location(angleNorth, dirInit, height, *perimeter,
+                   solver=LEAST_SQUARES)
+    simulator = Simulator(loc.garden, dirInit, angleNorth)
+    (xs, ys, headings) = waypointsTrajectory([(4.0, 4.0), (8.0, 5.0)], 0.2)
+    run = simulator.run(xs, ys, headings)
+    assert len(run) == len(xs)
+    assert run.bearings.shape == (len(xs), 6)
+
+    for (i, (angleToDirection, odometry, datas)) in enumerate(run):
+        assert len(datas) == 6
+        position = loc.computePos(angleToDirection, odometry, *datas)
+        assert position.distance(Point(xs[i], ys[i])) < 0.01
+
+
+def test_simulator_noise_seed():
+    perimeter = regularGarden(4)
+    (xs, ys, headings) = waypointsTrajectory([(4.0, 4.0), (8.0, 5.0)], 0.1)
+    runs = [Simulator(perimeter, dirInit, angleNorth, 2.0, 3.0, 0.05,
+                      seed=7).run(xs, ys, headings) for _ in range(2)]
+    assert np.array_equal(runs[0].bearings, runs[1].bearings)
+    assert np.array_equal(runs[0].dists, runs[1].dists)
+    exact = Simulator(perimeter, dirInit, angleNorth).run(xs, ys, headings)
+    assert not np.array_equal(runs[0].bearings, exact.bearings)
+
+
+def test_simulated_run_save_load(tmpdir):
+    perimeter = regularGarden(4)
+    (xs, ys, headings) = waypointsTrajectory([(4.0, 4.0), (8.0, 5.0)], 0.5)
+    run = Simulator(perimeter, dirInit, angleNorth, 1.0).run(xs, ys,
+                                                              headings)
+    path = str(tmpdir.join('run.npz'))
+    run.save(path)
+    loaded = SimulatedRun.load(path, perimeter)
+    assert np.array_equal(loaded.bearings, run.bearings)
+    assert loaded.dirInit == dirInit
+    assert loaded.angleNorth == angleNorth
+
+
+def test_simulated_run_jsonl(tmpdir):
+    perimeter = regularGarden(4)
+    (xs, ys, headings) = waypointsTrajectory([(4.0, 4.0), (8.0, 5.0)], 0.5)
+    run = Simulator(perimeter, dirInit, angleNorth).run(xs, ys, headings)
+    path = str(tmpdir.join('run.jsonl'))
+    run.writeJSONL(path, run='test')
+    with open(path) as log:
+        lines = [json.loads(line) for line in log]
+    assert len(lines) == len(run)
+    assert lines[1]['run'] == 'test'
+    assert lines[1]['frame'] == 1
+    assert len(lines[1]['odometry']) == 3
+    assert lines[1]['bearings'][0][0] == perimeter[0].color.name
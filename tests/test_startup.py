@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+import json
+import subprocess
+import sys
+
+import pytest
+
+import pleepleeloc
+
+# Cold start budget of the localization process (second): import the API
+# and compute a first position.
+STARTUP_BUDGET = 1.0
+
+SCRIPT = """
+import json
+import sys
+import time
+
+start = time.perf_counter()
+from pleepleeloc.geometry import Point
+from pleepleeloc.location import Location, Odometry
+from pleepleeloc.utils import LED, Color, Data
+imported = time.perf_counter() - start
+
+# Concave garden
+perimeter = [LED(Color.RED, Point(3.0, 3.0)),
+             LED(Color.GREEN, Point(1.0, 10.0)),
+             LED(Color.BLUE, Point(6.0, 8.0)),
+             LED(Color.WHITE, Point(11.0, 9.0)),
+             LED(Color.YELLOW, Point(13.0, 5.0))]
+loc = Location(-45.0, (-10.0, -10.0), 0.0, *perimeter)
+args = [-45.0, -90.0, loc.garden]
+datas = [Data(Color.RED, 135.0, *args), Data(Color.YELLOW, 18.43, *args)]
+loc.computePos(-90.0, Odometry(Point(7.0, 7.0), 0.1), *datas)
+total = time.perf_counter() - start
+
+print(json.dumps({'imported': imported, 'total': total,
+                  'convex': loc.garden.convex,
+                  'shapely': 'shapely' in sys.modules}))
+"""
+
+
+def test_lazy_submodules():
+    assert 'location' in dir(pleepleeloc)
+    assert pleepleeloc.location.Location is not None
+    with pytest.raises(AttributeError):
+        pleepleeloc.nothing
+
+
+def test_startup_time():
+    output = subprocess.run([sys.executable, '-c', SCRIPT], check=True,
+                            capture_output=True, text=True).stdout
+    res = json.loads(output)
+    assert not res['convex']
+    # shapely is not needed to compute a position
+    assert not res['shapely']
+    assert res['total'] < STARTUP_BUDGET
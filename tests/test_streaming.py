@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+import asyncio
+
+import numpy as np
+
+from pleepleeloc.geometry import Point
+from pleepleeloc.location import LEAST_SQUARES, Location, Odometry
+from pleepleeloc.simulation import (Simulator, regularGarden,
+                                    waypointsTrajectory)
+from pleepleeloc.streaming import LatestValue, PositionStream
+from pleepleeloc.utils import Color
+
+# Data:
+
+perimeter = regularGarden(5)
+dirInit = (-10.0, -10.0)
+angleNorth = -45.0
+height = 0.0
+
+
+def simulatedRun():
+    (xs, ys, headings) = waypointsTrajectory([(4.0, 4.0), (8.0, 4.0)], 0.5)
+    # Constant heading: the magnetic captor gives a single value
+    return Simulator(perimeter, dirInit, angleNorth).run(xs, ys, headings)
+
+
+def cameraFrames(run):
+    res = []
+    for i in range(len(run)):
+        order = np.argsort(-run.bearings[i], kind='stable')
+        res.append([(Color(int(run.colors[j])), float(run.bearings[i, j]))
+                    for j in order])
+    return res
+
+
+async def source(values, delay=0.0, done=None):
+    for value in values:
+        await asyncio.sleep(delay)
+        yield value
+    if done is not None:
+        # The last value is read by the stream
+        done.set()
+
+
+async def collect(stream):
+    return [position async for position in stream]
+
+
+# Test functions:
+
+
+def test_latest_value():
+    async def scenario():
+        slot = LatestValue()
+        slot.put(1)
+        slot.put(2)
+        assert await slot.get() == 2
+        slot.close()
+        return (slot.dropped, slot.value)
+
+    assert asyncio.run(scenario()) == (1, 2)
+
+
+def test_position_stream():
+    run = simulatedRun()
+    loc = Location(angleNorth, dirInit, height, *perimeter,
+                   solver=LEAST_SQUARES)
+    (angleToDirection, _, _) = run.frame(0)
+    odometry = Odometry(Point(6.0, 4.0), 2.0)
+
+    async def scenario():
+        ready = [asyncio.Event(), asyncio.Event()]
+        positions = asyncio.Queue()
+
+        async def camera(frames):
+            # Wait for the other captors, then send each frame once the
+            # position of the previous one is read, so none is dropped
+            await asyncio.gather(*(event.wait() for event in ready))
+            for frame in frames:
+                yield frame
+                await positions.get()
+
+        stream = PositionStream(loc, camera(cameraFrames(run)),
+                                source([angleToDirection], done=ready[0]),
+                                source([odometry], done=ready[1]))
+        res = []
+        async for position in stream:
+            res.append(position)
+            positions.put_nowait(position)
+        return (res, stream)
+
+    (res, stream) = asyncio.run(scenario())
+    assert len(res) == len(run) == stream.frames
+    assert stream.dropped == 0
+    for (position, actual) in zip(res, run.positions):
+        assert position.distance(Point(*actual)) < 0.01
+
+
+def test_position_stream_latest_wins():
+    run = simulatedRun()
+    loc = Location(angleNorth, dirInit, height, *perimeter,
+                   solver=LEAST_SQUARES)
+    (angleToDirection, _, _) = run.frame(0)
+    odometry = Odometry(Point(6.0, 4.0), 2.0)
+
+    async def burst(frames):
+        # Wait for the other captors, then send all the frames at once
+        await asyncio.sleep(0.01)
+        for frame in frames:
+            yield frame
+
+    stream = PositionStream(loc, burst(cameraFrames(run)),
+                            source([angleToDirection]), source([odometry]))
+    res = asyncio.run(collect(stream))
+    # Only the latest frame is computed
+    assert len(res) == 1
+    assert stream.dropped == len(run) - 1
+    assert res[0].distance(Point(*run.positions[-1])) < 0.01
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+
+import math
+
+import pytest
+
+from pleepleeloc.geometry import Point
+from pleepleeloc.location import LEAST_SQUARES, Location, Odometry
+from pleepleeloc.simulation import (Simulator, regularGarden,
+                                    waypointsTrajectory)
+from pleepleeloc.tracking import KalmanTracker, ParticleFilter
+from pleepleeloc.utils import LED, Color, Data
+
+# Data:
+
+corner1 = LED(Color.RED, Point(3.0, 3.0))
+corner2 = LED(Color.YELLOW, Point(13.0, 5.0))
+corner3 = LED(Color.BLUE, Point(11.0, 9.0))
+corner4 = LED(Color.GREEN, Point(1.0, 10.0))
+
+testPerimeter = [corner1, corner2, corner3, corner4]
+
+dirInit = (-10.0, -10.0)
+angleNorth = -45.0
+height = 0.0
+
+
+def frame(location, x, y, heading):
+    """Exact datas seen from (x, y) with a heading in degree."""
+    angleToDirection = (math.degrees(math.atan2(dirInit[1], dirInit[0])) -
+                        heading - angleNorth)
+    angles = []
+    for led in location.perimeter:
+        angle = heading - math.degrees(
+            math.atan2(led.point.Y - y, led.point.X - x))
+        angles.append(((angle + 180.0) % 360.0 - 180.0, led.color))
+    # From left to right as seen by the camera
+    angles.sort(reverse=True)
+    datas = [Data(color, angle, angleNorth, angleToDirection,
+                  location.garden) for (angle, color) in angles]
+    return (angleToDirection, datas)
+
+# Test functions:
+
+
+def test_kalman_tracker_follows_robot():
+    loc = Location(angleNorth, dirInit, height, *testPerimeter)
+    tracker = KalmanTracker(loc)
+    assert tracker.position is None
+
+    (angleToDirection, datas) = frame(loc, 7.0, 7.0, 0.0)
+    odometry = Odometry(Point(6.9, 7.0), 0.1)
+    position = tracker.computePos(angleToDirection, odometry, *datas[:3])
+    assert position.distance(Point(7.0, 7.0)) < 0.1
+
+    for step in range(1, 5):
+        x = 7.0 + 0.5 * step
+        (angleToDirection, datas) = frame(loc, x, 7.0, 0.0)
+        odometry = Odometry(position, 0.5)
+        position = tracker.computePos(angleToDirection, odometry, *datas)
+        assert position.distance(Point(x, 7.0)) < 0.05
+    assert abs(tracker.heading) < 1.0
+
+
+def test_kalman_tracker_predict_only():
+    loc = Location(angleNorth, dirInit, height, *testPerimeter)
+    tracker = KalmanTracker(loc)
+    tracker.reset(Point(5.0, 6.0), math.radians(90.0), 0.01)
+    tracker.predict(1.5)
+    assert tracker.position.distance(Point(5.0, 7.5)) < 1e-9
+    assert tracker.covariance[0, 0] > 0.01
+
+
+def test_kalman_tracker_rejects_outlier():
+    loc = Location(angleNorth, dirInit, height, *testPerimeter)
+    tracker = KalmanTracker(loc)
+    tracker.reset(Point(7.0, 7.0), 0.0, 0.0001)
+    (angleToDirection, datas) = frame(loc, 7.0, 7.0, 0.0)
+    wrong = Data(datas[0].led.color, datas[0].angle - angleToDirection -
+                 angleNorth + 60.0, angleNorth, angleToDirection, loc.garden)
+    assert not tracker.correctBearing(wrong, angleToDirection)
+    assert tracker.correctBearing(datas[1], angleToDirection)
+
+
+def test_particle_filter_global_localization():
+    loc = Location(angleNorth, dirInit, height, *testPerimeter)
+    pf = ParticleFilter(loc, count=5000, seed=3)
+    assert pf.position is None
+
+    (angleToDirection, datas) = frame(loc, 7.0, 7.0, 0.0)
+    for _ in range(3):
+        position = pf.computePos(angleToDirection, None, *datas)
+    assert position.distance(Point(7.0, 7.0)) < 0.2
+
+
+def test_particle_filter_follows_robot():
+    loc = Location(angleNorth, dirInit, height, *testPerimeter)
+    pf = ParticleFilter(loc, count=2000, seed=1)
+
+    (angleToDirection, datas) = frame(loc, 7.0, 7.0, 0.0)
+    odometry = Odometry(Point(6.9, 7.1), 0.1)
+    position = pf.computePos(angleToDirection, odometry, *datas[:2])
+    assert len(pf.xs) == 2000
+    for step in range(1, 5):
+        x = 7.0 + 0.5 * step
+        (angleToDirection, datas) = frame(loc, x, 7.0, 0.0)
+        odometry = Odometry(position, 0.5)
+        position = pf.computePos(angleToDirection, odometry, *datas)
+    assert position.distance(Point(9.0, 7.0)) < 0.2
+
+
+def test_particle_filter_resample():
+    loc = Location(angleNorth, dirInit, height, *testPerimeter)
+    pf = ParticleFilter(loc, count=100, seed=0)
+    pf.reset(0.0, Point(7.0, 7.0), 0.5)
+    pf.weights[:] = 0.0
+    pf.weights[42] = 1.0
+    pf.resample()
+    assert (pf.xs == pf.xs[0]).all()
+    assert pf.weights.sum() == pytest.approx(1.0)
+
+
+def turningRun(bearingNoise=0.0, headingNoise=0.0, odometryNoise=0.0):
+    """Frames of a trajectory with sharp turns in a hexagonal garden."""
+    perimeter = regularGarden(6)
+    loc = Location(0.0, (1.0, 0.0), height, *perimeter)
+    (xs, ys, headings) = waypointsTrajectory(
+        [(5.0, 5.0), (8.0, 6.0), (6.0, 9.0), (4.0, 6.0)], 0.05)
+    simulator = Simulator(loc.garden, (1.0, 0.0), 0.0, bearingNoise,
+                          headingNoise, odometryNoise, seed=5)
+    return (loc, simulator.run(xs, ys, headings))
+
+
+@pytest.mark.parametrize('noise', [(0.0, 0.0, 0.0), (2.0, 3.0, 0.05)])
+def test_kalman_tracker_turns(noise):
+    (loc, run) = turningRun(*noise)
+    tracker = KalmanTracker(loc)
+    for (i, (angleToDirection, odometry, datas)) in enumerate(run):
+        position = tracker.computePos(angleToDirection, odometry, *datas)
+        assert position.distance(Point(*run.positions[i])) < 0.3
+    assert abs(tracker.heading - run.headings[-1]) < 3.0
+
+
+def test_kalman_tracker_without_odometry():
+    # The candidates of the triangulation are not filtered without the
+    # odometry, the least squares give a single position
+    loc = Location(angleNorth, dirInit, height, *testPerimeter,
+                   solver=LEAST_SQUARES)
+    tracker = KalmanTracker(loc)
+    (angleToDirection, datas) = frame(loc, 7.0, 7.0, 0.0)
+    assert tracker.computePos(angleToDirection, None, datas[0]) is None
+    position = tracker.computePos(angleToDirection, None, *datas)
+    assert position.distance(Point(7.0, 7.0)) < 0.1
+    # No prediction without the odometry
+    position = tracker.computePos(angleToDirection, None, *datas)
+    assert position.distance(Point(7.0, 7.0)) < 0.1
+
+
+@pytest.mark.parametrize('noise', [(0.0, 0.0, 0.0), (2.0, 3.0, 0.05)])
+def test_particle_filter_turns(noise):
+    (loc, run) = turningRun(*noise)
+    pf = ParticleFilter(loc, count=1000, seed=2)
+    for (i, (angleToDirection, odometry, datas)) in enumerate(run):
+        position = pf.computePos(angleToDirection, odometry, *datas)
+        assert position.distance(Point(*run.positions[i])) < 0.3
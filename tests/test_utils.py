@@ -2,6 +2,7 @@
 
 import pytest
 
+from pleepleeloc.garden import Garden
 from pleepleeloc.geometry import Point
 from pleepleeloc.utils import LED, Color, Data
 
@@ -27,3 +28,18 @@ def test_data_adjust_distance():
     data2 = Data(Color.RED, 38.45, *args)
     assert data1.adjustDistance(6.8) == 9.6
     assert data2.adjustDistance(6.8) == 6.8
+
+
+def test_data_unknown_color():
+    perimeter = testPerimeter1
+    args = [20.0, 35.0, perimeter]
+    with pytest.raises(ValueError):
+        Data(Color.WHITE, 38.45, *args)
+    with pytest.raises(ValueError):
+        Data(Color.WHITE, 38.45, 20.0, 35.0, Garden(perimeter))
+
+
+def test_data_garden_index():
+    garden = Garden(testPerimeter1)
+    data = Data(Color.BLUE, 38.45, 20.0, 35.0, garden)
+    assert data.led is corner3